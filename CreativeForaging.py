@@ -5,14 +5,13 @@
 # AU 2018
 
 from psychopy import visual, core, event, gui, data
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from psychopy.visual import ShapeStim
-from scipy import spatial
-from scipy.spatial.distance import cdist
 import ppc3
+import logfiles
+import binlog
+from board import Board, START, reset_positions
+from thumbnails import GalleryRenderer
 
 # Create popup information box
 popup = gui.Dlg(title = "The Creative Game")
@@ -39,33 +38,39 @@ myMouse = event.Mouse()
 condition = ID[1]
 
 subject = ID[0] # the participant id
-writer = ppc3.csvWriter(subject, 'logfiles', headerTrial=True) 
+writer = ppc3.csvWriter(subject, 'logfiles', headerTrial=logfiles.FIELDS)
 
 # screenshot directory
 screen_shot_path = 'screenshots/'
+# gallery images are drawn off the render thread
+renderer = GalleryRenderer()
 
 # define clock
 clock = core.Clock()
 
+# frame durations, drag-to-draw latency and helper timings, saved next to the csv
+monitor = ppc3.timingMonitor(win.monitorFramePeriod or 1/60.)
+
 # get date for unique logfile id
 date = data.getDateStr()  
 
+# also write a compact binary log (see binlog.py) next to the csv
+BINARY_LOG = True
+blog = None
+if BINARY_LOG:
+    blog = binlog.Writer(writer.saveFile[:-len('.csv')] + '.cflog', id=subject, date=date, condition=condition)
+
 # gallery
 frame = visual.Rect(win, width=0.32, height=0.22, pos = [0, 0.35], fillColor = 'white')
 gallery = visual.ImageStim(win, image = 'default.png', pos = [0, 0.35], size = [0.3, 0.2])
 
 # initial positions
-pos = [[-0.315, 0.0], [-0.245,0.0], [-0.175,0.0], [-0.105,0.0], [-0.035,0.0], [0.035,0.0], [0.105,0.0], [0.175,0.0], [0.245,0.0], [0.315, 0.0]]
-
-units = []
-for i in range(10):
-    unit = visual.Rect(win, width=0.06, height=0.06, lineColor = None, fillColor = 'green', pos = pos[i])
-    units += [{
-        'unit': unit,
-        'number': i,
-        'neighbours': [],
-        'can_move': False,
-        'pos': pos[i]}]
+pos = START
+
+units = [visual.Rect(win, width=0.06, height=0.06, lineColor = None, fillColor = 'green', pos = pos[i])
+         for i in range(10)]
+board = Board(pos)
+movable = [False] * 10
 
 welcome = '''
 תרגול משחק
@@ -97,205 +102,31 @@ def msg(txt):
     message.draw()
     win.flip()
     event.waitKeys()
+    monitor.restart()
 
 def drw_units():
     for u in units:
-        u['unit'].draw()
+        u.draw()
     #gallery.draw()
 
 def drw_gallery():
     frame.draw()
     gallery.draw()
 
-def allowed_pos(target):
-    allowed = []
-    for u in units:
-        if u['number'] != target:
-            pos = [
-                [round(u['pos'][0] - 0.07,3), round(u['pos'][1],3)], 
-                [round(u['pos'][0] + 0.07,3), round(u['pos'][1],3)], 
-                [round(u['pos'][0], 3), round(u['pos'][1] - 0.07,3)], 
-                [round(u['pos'][0], 3), round(u['pos'][1] + 0.07,3)]] 
-
-            allowed += pos
-           
-    # remove dublicate positions
-    a_set = set(tuple(x) for x in allowed)
-    allowed = [ list(x) for x in a_set ]
-    
-    # sort out existing positions
-    existing_pos = [unit['pos'] for unit in units] 
-    allowed = [pos for pos in allowed if pos not in existing_pos ]
-    
-    # remove out extreme regions
-    allowed = [pos for pos in allowed if pos[0] < 0.735 and pos[0] > -0.735]
-    allowed = [pos for pos in allowed if pos[1] < 0.49 and pos[1] > -0.49]
-    
-    return allowed
-
-def update_neighbours():
-    for u in units:
-        neighbours = []
-        pos = [
-                [round(u['pos'][0] - 0.07,3), round(u['pos'][1],3)], 
-                [round(u['pos'][0] + 0.07,3), round(u['pos'][1],3)], 
-                [round(u['pos'][0], 3), round(u['pos'][1] - 0.07,3)], 
-                [round(u['pos'][0], 3), round(u['pos'][1] + 0.07,3)]] 
-        existing_pos = [unit['pos'] for unit in units] 
-        for p in pos:
-            if p in existing_pos:
-                n = [existing_pos[existing_pos.index(p)]]
-                neighbours += n
-        u['neighbours'] = neighbours
-                
-
-
-def snap_to_allowed(allowed, pos):
-    a_pos = allowed[spatial.KDTree(allowed).query(pos)[1]]
-    return a_pos
-
-def update_positions():
-    position_update = [unit['pos'] for unit in units]
-    return position_update
-
-def is_contiguous(grid):
+def can_move(phase):
+    global movable
     
-    items = {(x, y) for x, row in enumerate(grid) for y, f in enumerate(row) if f}
-
-    directions = [(0, 1), (1, 0), (-1, 0), (0, -1)]
-    neighbours = {(x, y): [(x+dx, y+dy) for dx, dy in directions if (x+dx, y+dy) in items]
-                  for x, y in items}
-
-    closed = set()
-    fringe = [next(iter(items))]
-    while fringe:
-        i = fringe.pop()
-        if i in closed:
-            continue
-        closed.add(i)
-        for n in neighbours[i]:
-            fringe.append(n)
-
-    return items == closed
-
-def prepare_matrix(pos, t):
-    x = pd.DataFrame(pos)#.sort_values(by=0)
-    
-    x = np.arange(-0.945, 1.015, 0.07)
-    y = np.append(np.arange(-0.7, 0, 0.07), np.arange(0, 0.77, 0.07))
-    x = np.around(x, 3)
-    y = np.around(y, 3)
-    
-    grid = np.zeros(shape=(len(y),len(x)))
-    
-    for i in pos:
+    movable = board.removable()
+    for j, m in enumerate(movable):
+        if phase == 'practice':
+            units[j].fillColor = 'blue' if m else 'green'
+        else:
+            units[j].fillColor = 'green'
         
-        grid[y.tolist().index(i[1]), x.tolist().index(i[0])] = i[0]
-    
-    grid[y.tolist().index(pos[t][1]), x.tolist().index(pos[t][0])] = 0.0
-    
-    
-    grid = grid.tolist()
-    
-    return is_contiguous(grid)
-
-def can_move(pos,phase):
-    
-    for j in range(len(pos)):
-        if prepare_matrix(pos[:],j):
-            units[j]['can_move'] = True
-            if phase == 'practice':
-                units[j]['unit'].fillColor = 'blue'
-        elif not prepare_matrix(pos[:],j):
-            units[j]['can_move'] = False
-            if phase == 'practice':
-                units[j]['unit'].fillColor = 'green'
-        if phase == 'experiment': 
-            units[j]['unit'].fillColor = 'green'
-        
-def closest_node(node, nodes):
-    return nodes[cdist([node], nodes).argmin()]
-
-def reset_positions(figure):
-    try:
-        # calculate centroid
-        x,y=zip(*figure)
-        centroid=(max(x)+min(x))/2., (max(y)+min(y))/2.
-        # find the node closest to the centroid
-        c_node = closest_node(centroid, figure)
-    
-        # calculate the difference between centroid and center node 
-        c_node_dif = [p*-1 for p in c_node]
-        
-        # move all node coordinates by the distance
-        fig_update = [list(np.array(f) + np.array(c_node_dif)) for f in figure]
-        fig_update = [[round(f[0],3) , round(f[1],3)] for f in fig_update]
-        fig_update.sort()
-    except:
-        fig_update = np.nan
-        
-    return fig_update
-    
-def draw_and_save_squares_zoomed_centered_fixed_canvas(
-    coords, square_size=0.07, canvas_size=10, margin=0.2, output_file='output.png'):
-    """
-    Draws green squares centered and zoomed within a fixed-size canvas, then saves it.
-
-    Args:
-    coords (list of tuples): List of (x, y) centered around (0, 0).
-    square_size (float): Width/height of each square.
-    canvas_size (float): Fixed size of canvas (both width and height).
-    margin (float): Padding around squares to avoid edge clipping (in canvas units).
-    output_file (str): Filename for saving the image.
-    """
-    fig, ax = plt.subplots(figsize=(5, 5), dpi=100)
-    fig.patch.set_facecolor('black')
-    ax.set_facecolor('black')
-
-    # Shift coordinates to [0, 1] range
-    shifted_coords = [(x + 0.5, y + 0.5) for x, y in coords]
-
-    # Compute bounding box of shifted squares
-    xs, ys = zip(*shifted_coords)
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
-
-    # Compute center of squares
-    center_x = (min_x + max_x + square_size) / 2
-    center_y = (min_y + max_y + square_size) / 2
-
-    # Scale shifted coordinates to canvas units centered at (canvas_size/2, canvas_size/2)
-    final_coords = [
-    (
-    (x - center_x) * canvas_size + (canvas_size / 2),
-    (y - center_y) * canvas_size + (canvas_size / 2)
-    )
-    for x, y in shifted_coords
-    ]
-
-    # Set fixed canvas limits with margin
-    ax.set_xlim(0, canvas_size)
-    ax.set_ylim(0, canvas_size)
-    ax.set_aspect('equal')
-
-    # Draw the squares
-    for (x, y) in final_coords:
-        square = patches.Rectangle(
-        (x, y), square_size * canvas_size, square_size * canvas_size,
-        linewidth=1,
-        edgecolor='black',
-        facecolor='green'
-        )
-        ax.add_patch(square)
-
-    plt.axis('off')
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-    plt.savefig(output_file, dpi=300, bbox_inches='tight', pad_inches=0, facecolor='black')
-    plt.close()
-
 def save_to_gallery(positions, subject, gallery_number, date):
     
     pos_norm = reset_positions(positions)
+    t = clock.getTime()
     
     trial = {
         'date': date,
@@ -303,7 +134,8 @@ def save_to_gallery(positions, subject, gallery_number, date):
         'condition': condition,
         'phase': phase,
         'type': 'added shape to gallery',
-        'time': clock.getTime(),
+        'start_time': t,
+        'end_time': np.nan,
         'unit': np.nan,
         'end_position': np.nan,
         'all_positions': np.nan,
@@ -311,21 +143,28 @@ def save_to_gallery(positions, subject, gallery_number, date):
         'gallery': positions,
         'gallery_normalized': pos_norm
         }
+    t0 = monitor.clock()
     writer.write(trial)
+    if blog:
+        blog.write(binlog.GALLERY, phase, binlog.to_cells(positions), t, gallery_shape_number=gallery_number)
+    monitor.add('log', monitor.clock() - t0)
     filename = 'gallery_{}_{}_{}.png'.format(subject, gallery_number, date)
     drw_units()
     win.flip()
+    monitor.flipped()
     #win.getMovieFrame()
     #win.saveMovieFrames(screen_shot_path + filename)
-    draw_and_save_squares_zoomed_centered_fixed_canvas(positions,output_file=screen_shot_path + filename)
-
-    gallery.image = (screen_shot_path + filename)
+    # shown by the main loop once the renderer has written it
+    renderer.submit(positions, screen_shot_path + filename)
 
     
 gallery_number = 0
 release = False
 endTrial = False
 phase = 'practice'
+# derived board state (positions, movable blocks, colours) is only
+# recomputed when this is set: after a snap, a phase switch or a reset
+dirty = True
 
 msg(welcome)
 
@@ -340,12 +179,16 @@ while not endTrial:
         msg(practice_done)
         phase = 'experiment'
         clock.reset()
+        renderer.reset()  # practice images still queued or being drawn must not show up in the experiment
+        board = Board(pos)
         for i in range(10):
-            units[i]['unit'].setPos(pos[i])
+            units[i].setPos(pos[i])
         gallery.image = 'default.png'
+        dirty = True
         drw_units()
         drw_gallery()
         win.flip()
+        monitor.restart()
             
     
     
@@ -354,24 +197,28 @@ while not endTrial:
     # get mouse button presses
     mouse1, mouse2, mouse3 = myMouse.getPressed()
     # HERE
-    # update neighbours
-    update_neighbours()
-    
     # update which units can move
-    positions = update_positions()
-    can_move(positions, phase)
+    if dirty:
+        t0 = monitor.clock()
+        positions = board.positions()
+        can_move(phase)
+        monitor.add('can_move', monitor.clock() - t0)
+        dirty = False
     
     # check if object is clicked
-    for unit in units:
-        unit['pos'] = [round(unit['unit'].pos[0], 3), round(unit['unit'].pos[1], 3)]
+    for i, unit in enumerate(units):
+        if not (mouse1 and movable[i]):
+            continue
         
-        while mouse1 and myMouse.isPressedIn(unit['unit']) and unit['can_move']:
-            target = unit
-            target['unit'].setPos(myMouse.getPos())
+        while mouse1 and myMouse.isPressedIn(unit) and movable[i]:
+            target = i
+            dragTime = monitor.clock()
+            unit.setPos(myMouse.getPos())
             #HERE
             drw_units()
             drw_gallery()
             win.flip()
+            monitor.add('drag_to_draw', monitor.flipped() - dragTime)
             if not release:
                 startTime = clock.getTime()
             release = True
@@ -379,10 +226,12 @@ while not endTrial:
         if release:
             release = False
             # HERE
-            al_pos = allowed_pos(target['number'])
-            snap = snap_to_allowed(al_pos, target['unit'].pos)
-            target['unit'].setPos(snap)
-            target['pos'] = snap
+            t0 = monitor.clock()
+            snap = board.snap(target, units[target].pos)
+            board.move(target, snap)
+            monitor.add('snap', monitor.clock() - t0)
+            units[target].setPos(board.screen_pos(target))
+            endTime = clock.getTime()
             
             trial = {
             'date': date,
@@ -391,32 +240,47 @@ while not endTrial:
             'phase': phase,
             'type': 'moveblock',
             'start_time': startTime,
-            'end_time': clock.getTime(),
-            'unit': target['number'],
-            'end_position': snap,
+            'end_time': endTime,
+            'unit': target,
+            'end_position': board.screen_pos(target),
             'all_positions': positions,
             'gallery_shape_number': np.nan,
             'gallery': np.nan,
             'gallery_normalized': np.nan
             }
+            t0 = monitor.clock()
             writer.write(trial)
-            
-            positions = update_positions()
-            can_move(positions,phase)
-            
-        drw_units()
-        
+            if blog:
+                blog.write(binlog.MOVE, phase, board.cells, startTime, endTime, unit=target)
+            monitor.add('log', monitor.clock() - t0)
+            # the board after the move, for a gallery tap in this same iteration;
+            # the movable blocks are recomputed at the top of the next one
+            positions = board.positions()
+            dirty = True
+            break
         
     if myMouse.isPressedIn(gallery):
         myMouse.clickReset()
         if not mouse_down_detected:
             gallery_number += 1
+            t0 = monitor.clock()
             save_to_gallery(positions, subject, gallery_number, date)
+            monitor.add('save_to_gallery', monitor.clock() - t0)
             drw_units()
             drw_gallery()
             win.flip()
             mouse_down_detected = True
             core.wait(0.2)
+            monitor.restart()
+    for image in renderer.finished():
+        gallery.image = image
+    drw_units()
     drw_gallery()
     win.flip()
+    monitor.flipped()
+renderer.close()
+writer.close()
+if blog:
+    blog.close()
+monitor.save(writer.saveFile[:-len('.csv')] + ' timing.json')
 msg(bye)
\ No newline at end of file
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Classifying frames as a batch job instead of one call per frame.
+
+A batch is a JSONL file with one request per frame; its custom_id is the
+frame file name, so results can be matched back to frames in any order. The
+file is submitted once, the job is polled until it is done, and the results
+file is read back into {custom_id: reply text}. OpenAIBatches uses the
+OpenAI Batch API; LocalBatches is a stand-in on the local disk with the same
+methods for trying the flow offline. Usage::
+    write_requests('batch_requests.jsonl', [(frame.name, body), ...])
+    job = submit(OpenAIBatches(client), 'batch_requests.jsonl', 'batch_job.json')
+    poll(OpenAIBatches(client), 'batch_job.json', 'batch_results.jsonl')
+    replies = read_results('batch_results.jsonl')
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+
+REQUESTS_FILE = 'batch_requests.jsonl'  # not requests.jsonl, which is ignored by git for other uses
+RESULTS_FILE = 'batch_results.jsonl'
+JOB_FILE = 'batch_job.json'
+LOCAL_DIR = '.batches'
+ENDPOINT = '/v1/responses'
+FINISHED = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def write_requests(filename, requests):
+    """ writes (custom_id, request body) pairs as a batch input file. Returns the number of requests. """
+    n = 0
+    with open(filename, 'w', encoding='utf-8') as f:
+        for custom_id, body in requests:
+            f.write(json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': ENDPOINT, 'body': body}) + '\n')
+            n += 1
+    return n
+
+
+def output_text(body):
+    """ the reply text of a Responses API response body, like the SDK's response.output_text """
+    if body.get('output_text'):
+        return body['output_text']
+    return ''.join(part.get('text', '') for item in body.get('output', []) if item.get('type') == 'message'
+                   for part in item.get('content', []) if part.get('type') == 'output_text')
+
+
+def read_results(filename):
+    """ {custom_id: reply text, or None for a failed request} of a batch output file """
+    replies = {}
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get('response') or {}
+            ok = not result.get('error') and response.get('status_code') == 200
+            replies[result['custom_id']] = output_text(response['body']) if ok else None
+    return replies
+
+
+class OpenAIBatches(object):
+    def __init__(self, client):
+        """ :client: an openai.OpenAI client """
+        self.client = client
+
+    def submit(self, filename):
+        """ uploads the input file and starts a job. Returns its id. """
+        with open(filename, 'rb') as f:
+            uploaded = self.client.files.create(file=f, purpose='batch')
+        return self.client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT,
+                                          completion_window='24h').id
+
+    def status(self, job_id):
+        """ (status, output file id or None) """
+        batch = self.client.batches.retrieve(job_id)
+        return batch.status, batch.output_file_id
+
+    def download(self, file_id, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(self.client.files.content(file_id).text)
+
+
+def stand_in_reply(body):
+    return "neither\nanswered by the local batch stand-in"
+
+
+class LocalBatches(object):
+    def __init__(self, directory=LOCAL_DIR, respond=stand_in_reply):
+        """
+        Keeps jobs as files in directory. A job completes the first time its
+        status is asked for, answering every request with respond(request body).
+        """
+        self.directory = directory
+        self.respond = respond
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def submit(self, filename):
+        job_id = 'batch_local_' + uuid.uuid4().hex[:12]
+        shutil.copyfile(filename, self._path(job_id, '.input.jsonl'))
+        return job_id
+
+    def status(self, job_id):
+        output = self._path(job_id, '.output.jsonl')
+        if not os.path.isfile(output):
+            with open(self._path(job_id, '.input.jsonl'), encoding='utf-8') as f, \
+                    open(output + '.tmp', 'w', encoding='utf-8') as out:
+                for line in f:
+                    request = json.loads(line)
+                    body = {'output': [{'type': 'message', 'content': [
+                        {'type': 'output_text', 'text': self.respond(request['body'])}]}]}
+                    out.write(json.dumps({'id': uuid.uuid4().hex, 'custom_id': request['custom_id'],
+                                          'response': {'status_code': 200, 'body': body}, 'error': None}) + '\n')
+            os.replace(output + '.tmp', output)
+        return 'completed', output
+
+    def download(self, file_id, filename):
+        shutil.copyfile(file_id, filename)
+
+
+def submit(batches, requests_file=REQUESTS_FILE, job_file=JOB_FILE):
+    """ submits requests_file and saves the job id to job_file. Returns the id. """
+    job_id = batches.submit(requests_file)
+    with open(job_file, 'w', encoding='utf-8') as f:
+        json.dump({'id': job_id, 'requests': requests_file, 'submitted': time.time()}, f, indent=1)
+    return job_id
+
+
+def poll(batches, job_file=JOB_FILE, results_file=RESULTS_FILE, interval=60., timeout=None):
+    """
+    Waits until the job in job_file is finished and downloads its results to
+    results_file. Returns the final status; None if timeout seconds passed first.
+    """
+    with open(job_file, encoding='utf-8') as f:
+        job_id = json.load(f)['id']
+    started = time.monotonic()
+    while True:
+        status, output_file = batches.status(job_id)
+        print(f"Batch {job_id}: {status}")
+        if status in FINISHED:
+            break
+        if timeout is not None and time.monotonic() - started + interval > timeout:
+            return None
+        time.sleep(interval)
+    if output_file:
+        batches.download(output_file, results_file)
+    return status
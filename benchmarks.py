@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Microbenchmarks for the game and analysis hot paths.
+
+Every benchmark runs one pass over a fixed, seeded fixture (simulated boards,
+the sample logsByGame.csv), so results are comparable between runs and
+machines. Results are written as json; --compare reports the change of each
+median against a saved run and exits with 1 on a regression.
+
+    python benchmarks.py --save baseline.json
+    python benchmarks.py --compare baseline.json
+    python benchmarks.py --filter board.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+SAMPLE_LOG = str(HERE / "logsByGame.csv")
+SEED = 1234
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a fixture builder: it returns (function running one pass, number of items per pass)."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def board_fixtures(n=64, moves=40):
+    """n boards taken from seeded random games after 0 to moves moves"""
+    from board import Board, to_screen
+    import simulator
+    cells, _ = simulator.random_games(n, moves, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    steps = rng.integers(0, moves + 1, n)
+    return [Board([to_screen(c) for c in cells[i, t].tolist()]) for i, t in enumerate(steps)]
+
+
+def gallery_fixtures():
+    import logfiles
+    return [row["gallery"] for row in logfiles.read_log(SAMPLE_LOG) if row["gallery"]]
+
+
+@benchmark("board.removable")
+def bench_removable():
+    boards = board_fixtures()
+    return lambda: [b.removable() for b in boards], len(boards)
+
+
+@benchmark("board.frontier")
+def bench_frontier():
+    boards = board_fixtures()
+    return lambda: [b.frontier(i % len(b)) for i, b in enumerate(boards)], len(boards)
+
+
+@benchmark("board.snap")
+def bench_snap():
+    boards = board_fixtures()
+    rng = np.random.default_rng(SEED)
+    pointers = rng.uniform([-0.7, -0.45], [0.7, 0.45], (len(boards), 2)).tolist()
+    return lambda: [b.snap(i % len(b), p) for i, (b, p) in enumerate(zip(boards, pointers))], len(boards)
+
+
+@benchmark("board.move")
+def bench_move():
+    boards = board_fixtures()
+    moves = []
+    for b in boards:
+        unit = b.removable().index(True)
+        moves.append((b, unit, b.cell(unit), min(b.frontier(unit))))
+
+    def run():
+        for b, unit, old, new in moves:
+            b.move(unit, new)
+            b.move(unit, old)
+    return run, 2 * len(moves)
+
+
+@benchmark("board.reset_positions")
+def bench_reset_positions():
+    from board import reset_positions
+    figures = gallery_fixtures()
+    return lambda: [reset_positions(f) for f in figures], len(figures)
+
+
+@benchmark("shapes.shape_hash")
+def bench_shape_hash():
+    import shapes
+    figures = gallery_fixtures()
+    return lambda: [shapes.shape_hash(f) for f in figures], len(figures)
+
+
+@benchmark("thumbnails.render")
+def bench_thumbnail():
+    import thumbnails
+    figures = gallery_fixtures()
+    return lambda: [thumbnails.encode_png(thumbnails.rasterize(f)) for f in figures], len(figures)
+
+
+@benchmark("logfiles.read_log")
+def bench_read_log():
+    import logfiles
+    return lambda: logfiles.read_log(SAMPLE_LOG), 1
+
+
+@benchmark("replay.state_at")
+def bench_replay():
+    from replay import Replay
+    replay = Replay.from_csv(SAMPLE_LOG)
+    times = np.random.default_rng(SEED).uniform(0, 100, 256).tolist()
+    return lambda: [replay.state_at(t) for t in times], len(times)
+
+
+@benchmark("shape_features.features")
+def bench_features():
+    import shape_features
+    import simulator
+    cells, _ = simulator.random_games(1000, 20, seed=SEED)
+    figures = cells[:, -1]
+    return lambda: shape_features.features(figures), len(figures)
+
+
+@benchmark("simulator.random_step")
+def bench_random_step():
+    import simulator
+    cells, _ = simulator.random_games(256, 10, seed=SEED)
+    start = cells[:, -1]
+
+    def run():
+        simulator.random_step(start.copy(), np.random.default_rng(SEED))
+    return run, len(start)
+
+
+@benchmark("create_logs_table_3.extract_frame_time")
+def bench_extract_frame_time():
+    from create_logs_table_3 import extract_frame_time
+    rng = np.random.default_rng(SEED)
+    names = [f"frame_at_{t:.3f}s" for t in rng.uniform(0, 1800, 100)]
+    names += [f"frame_{int(t):06d}" for t in rng.uniform(0, 1800, 100)]
+    names += ["2025-07-27_18h11.58.511"] * 100
+    return lambda: [extract_frame_time(n) for n in names], len(names)
+
+
+@benchmark("create_logs_table_3.match_frame")
+def bench_match_frame():
+    from create_logs_table_3 import load_game_logs, match_frame
+    interval_rows, point_rows = load_game_logs(SAMPLE_LOG)
+    seconds = list(range(0, 120))
+    return lambda: [match_frame(s, interval_rows, point_rows) for s in seconds], len(seconds)
+
+
+def measure(run, items, repeat, min_time):
+    """Times run() like timeit: enough calls per sample to take min_time, repeat samples."""
+    timer = timeit.Timer(run)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    q = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "items": items,
+        "number": number,
+        "repeat": repeat,
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "iqr_s": q[2] - q[0],
+        "median_per_item_us": statistics.median(samples) / items * 1e6,
+    }
+
+
+def run_benchmarks(names, repeat, min_time):
+    results = {}
+    for name in names:
+        try:
+            run, items = BENCHMARKS[name]()
+        except ImportError as e:  # e.g. no pandas on a game machine
+            print(f"{name:45s} skipped ({e})")
+            continue
+        results[name] = measure(run, items, repeat, min_time)
+        print(f"{name:45s} {results[name]['median_per_item_us']:12.3f} us/item "
+              f"(median of {repeat}, ±{results[name]['iqr_s'] / items * 1e6:.3f} IQR)")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of every median against baseline. Returns the names that got slower than threshold."""
+    slower = []
+    print(f"\n{'benchmark':45s} {'baseline':>12s} {'now':>12s} {'change':>8s}")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:45s} {'-':>12s} {r['median_per_item_us']:12.3f}      new")
+            continue
+        change = r["median_s"] / old["median_s"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            slower.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:45s} {old['median_per_item_us']:12.3f} {r['median_per_item_us']:12.3f} {change:+8.1%}{flag}")
+    return slower
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmarks for the game and analysis hot paths.")
+    ap.add_argument("--filter", default="", help="Only run benchmarks whose name contains this.")
+    ap.add_argument("--repeat", type=int, default=7, help="Samples per benchmark (default: 7).")
+    ap.add_argument("--min-time", type=float, default=0.05, help="Seconds per sample (default: 0.05).")
+    ap.add_argument("--save", help="Write the results as json to this file.")
+    ap.add_argument("--compare", help="json results of an earlier run to compare against.")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="Relative slowdown of the median reported as a regression (default: 0.10).")
+    ap.add_argument("--list", action="store_true", help="List the benchmarks and exit.")
+    args = ap.parse_args()
+
+    names = [n for n in BENCHMARKS if args.filter in n]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    sys.path.insert(0, str(HERE))
+    results = run_benchmarks(names, args.repeat, args.min_time)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
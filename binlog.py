@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary session logs.
+
+A .cflog file is the 8 byte MAGIC, a little endian uint32 with the length
+of a json header (session metadata and board geometry), and then one
+fixed-width RECORD per event holding the board as int8 lattice cells. It
+holds the same events as the csv log at a fraction of the size and loads
+with a single numpy call. Usage::
+    log = binlog.read('logfiles/999 (2025-07-27 18-11-58).cflog')
+    log.positions()                     # (N, 10, 2) screen positions after every event
+    log.cells(binlog.GALLERY)           # (G, 10, 2) lattice cells of the gallery figures
+    log.records['start_time']
+"""
+import atexit
+import collections
+import json
+import struct
+import threading
+
+import numpy as np
+
+from board import COLS, ROWS, STEP, X_OFFSET, Y_OFFSET
+import logfiles
+
+MAGIC = b'CFGLOG01'
+VERSION = 1
+BLOCKS = 10
+
+MOVE, GALLERY = 0, 1
+KINDS = (logfiles.MOVE, logfiles.GALLERY)
+PHASES = ('practice', 'experiment')
+
+RECORD = np.dtype([
+    ('kind', 'u1'),  # MOVE or GALLERY
+    ('phase', 'u1'),  # index into PHASES
+    ('unit', 'i1'),  # moved block, -1 for gallery events
+    ('gallery_shape_number', '<i2'),  # -1 for moves
+    ('start_time', '<f8'),
+    ('end_time', '<f8'),  # nan for gallery events
+    ('cells', 'i1', (BLOCKS, 2)),  # (col, row) of every block after the event
+])
+
+OFFSET = np.array([X_OFFSET, Y_OFFSET])
+
+
+def to_cells(positions):
+    """ (..., 2) screen positions -> int8 lattice cells, vectorized """
+    return np.rint(np.asarray(positions, dtype=float) / STEP + OFFSET).astype(np.int8)
+
+
+def to_positions(cells):
+    """ (..., 2) lattice cells -> screen positions, rounded like the csv logs """
+    return np.round((np.asarray(cells, dtype=float) - OFFSET) * STEP, 3)
+
+
+class Writer(object):
+    def __init__(self, filename, flush_interval=0.5, **meta):
+        """
+        Creates a .cflog file and appends one record per write(). Like ppc3.csvWriter,
+        write() only buffers the record; a background thread writes the buffer to disk
+        every flush_interval seconds, and close(), which also runs at exit, writes the rest.
+
+        :flush_interval: seconds between writes to disk
+        :meta: json-serializable session information (id, date, condition, ...) stored in the header
+        """
+        self.filename = filename
+        header = dict(meta, version=VERSION, blocks=BLOCKS, cols=COLS, rows=ROWS, step=STEP)
+        header = json.dumps(header).encode('utf-8')
+        self.file = open(filename, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.file.flush()
+        self.record = np.zeros(1, dtype=RECORD)
+
+        self.flush_interval = flush_interval
+        self.buffer = collections.deque()  # records waiting for the background thread
+        self.lock = threading.Lock()  # one flush at a time
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='binlog.Writer')
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, kind, phase, cells, start_time, end_time=np.nan, unit=-1, gallery_shape_number=-1):
+        """
+        :kind: MOVE or GALLERY
+        :phase: 'practice' or 'experiment'
+        :cells: (10, 2) lattice cells of the board after the event, e.g. Board.cells
+        """
+        if self.closed:
+            raise ValueError('write to closed binlog.Writer: ' + self.filename)
+        r = self.record[0]
+        r['kind'] = kind
+        r['phase'] = PHASES.index(phase)
+        r['unit'] = unit
+        r['gallery_shape_number'] = gallery_shape_number
+        r['start_time'] = start_time
+        r['end_time'] = end_time
+        r['cells'] = cells
+        self.buffer.append(self.record.tobytes())
+
+    def flush(self):
+        """ writes the buffered records to disk now """
+        with self.lock:
+            if not self.buffer or self.file.closed:
+                return
+            while self.buffer:
+                self.file.write(self.buffer.popleft())
+            self.file.flush()
+
+    def close(self):
+        """ writes the remaining records and closes the file. Safe to call more than once. """
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+    def _run(self):
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.flush()
+
+
+class BinaryLog(object):
+    def __init__(self, filename):
+        """ reads a .cflog file. The records are memory mapped, not loaded. """
+        with open(filename, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError('not a Creative Foraging binary log: ' + filename)
+            size, = struct.unpack('<I', f.read(4))
+            self.meta = json.loads(f.read(size).decode('utf-8'))
+        offset = len(MAGIC) + 4 + size
+        self.filename = filename
+        self.records = np.memmap(filename, dtype=RECORD, mode='r', offset=offset)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _select(self, kind):
+        return self.records if kind is None else self.records[self.records['kind'] == kind]
+
+    def cells(self, kind=None):
+        """ (N, 10, 2) int8 lattice cells after each event, optionally only of MOVE or GALLERY events """
+        return np.asarray(self._select(kind)['cells'])
+
+    def positions(self, kind=None):
+        """ (N, 10, 2) float64 screen positions after each event """
+        return to_positions(self.cells(kind))
+
+    def times(self, kind=None):
+        """ (N,) start times of the events """
+        return np.asarray(self._select(kind)['start_time'])
+
+
+def read(filename):
+    return BinaryLog(filename)
+
+
+def convert(csv_file, cflog_file):
+    """ writes the events of a csv session log as a .cflog file. Returns the number of records. """
+    rows = logfiles.read_log(csv_file)
+    meta = {k: rows[0][k] for k in ('id', 'date', 'condition')} if rows else {}
+    writer = Writer(cflog_file, **meta)
+    n = 0
+    for row in rows:
+        if row['type'] == logfiles.MOVE and row['all_positions'] and row['end_position']:
+            cells = to_cells(row['all_positions'])
+            cells[row['unit']] = to_cells(row['end_position'])
+            writer.write(MOVE, row['phase'], cells, row['start_time'], row['end_time'], unit=row['unit'])
+        elif row['type'] == logfiles.GALLERY and row['gallery']:
+            number = row['gallery_shape_number']
+            writer.write(GALLERY, row['phase'], to_cells(row['gallery']), row['start_time'],
+                         gallery_shape_number=-1 if number is None else int(number))
+        else:
+            continue
+        n += 1
+    writer.close()
+    return n
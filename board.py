@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Integer lattice model of the Creative Foraging board.
+
+Blocks live on a lattice with a pitch of 0.07 screen ('height') units. The
+playable area of the original game (|x| < 0.735, |y| < 0.49) is exactly
+COLS x ROWS lattice cells, so every rule can work on small integers and a
+numpy int8 occupancy array; screen coordinates are only needed for drawing
+and logging.
+"""
+import numpy as np
+
+STEP = 0.07  # distance between neighbouring block centres
+COLS = 20  # x from -0.665 to 0.665
+ROWS = 13  # y from -0.42 to 0.42
+X_OFFSET = (COLS - 1) / 2.
+Y_OFFSET = (ROWS - 1) / 2.
+
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# the row of blocks every game starts from
+START = [[-0.315, 0.0], [-0.245, 0.0], [-0.175, 0.0], [-0.105, 0.0], [-0.035, 0.0],
+         [0.035, 0.0], [0.105, 0.0], [0.175, 0.0], [0.245, 0.0], [0.315, 0.0]]
+
+
+def to_lattice(pos):
+    """ returns the (col, row) cell of a screen position """
+    return (int(round(pos[0] / STEP + X_OFFSET)), int(round(pos[1] / STEP + Y_OFFSET)))
+
+
+def to_lattice_float(pos):
+    """ returns a screen position in (fractional) lattice units """
+    return (pos[0] / STEP + X_OFFSET, pos[1] / STEP + Y_OFFSET)
+
+
+def to_screen(cell):
+    """ returns the screen position of a (col, row) cell, rounded like the logfiles """
+    return [round((cell[0] - X_OFFSET) * STEP, 3), round((cell[1] - Y_OFFSET) * STEP, 3)]
+
+
+def in_bounds(cell):
+    return 0 <= cell[0] < COLS and 0 <= cell[1] < ROWS
+
+
+class Board(object):
+    """
+    Positions of the blocks as integer lattice cells.
+
+    :cells: (n, 2) int8 array with the (col, row) cell of every block
+    :grid: (ROWS, COLS) int8 occupancy array holding block number + 1, 0 when free
+    :touch: (ROWS, COLS) int8 array counting the blocks that share an edge with each cell
+    :boundary: set of free cells with touch > 0, kept up to date by move()
+    """
+    __slots__ = ('cells', 'grid', 'touch', 'boundary')
+
+    def __init__(self, positions):
+        """ :positions: list of [x, y] screen positions, one per block """
+        self.cells = np.zeros((len(positions), 2), dtype=np.int8)
+        self.grid = np.zeros((ROWS, COLS), dtype=np.int8)
+        self.touch = np.zeros((ROWS, COLS), dtype=np.int8)
+        self.boundary = set()
+        for i, p in enumerate(positions):
+            self._place(i, to_lattice(p))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def cell(self, i):
+        """ (col, row) of block i """
+        return int(self.cells[i, 0]), int(self.cells[i, 1])
+
+    def occupant(self, cell):
+        """ number of the block on cell, or -1 if the cell is free or off the board """
+        if not in_bounds(cell):
+            return -1
+        return int(self.grid[cell[1], cell[0]]) - 1
+
+    def is_free(self, cell):
+        """ True if a block may be placed on cell """
+        return in_bounds(cell) and self.grid[cell[1], cell[0]] == 0
+
+    def neighbours(self, i):
+        """ numbers of the blocks that share an edge with block i """
+        col, row = self.cell(i)
+        found = []
+        for dc, dr in DIRECTIONS:
+            j = self.occupant((col + dc, row + dr))
+            if j >= 0:
+                found.append(j)
+        return found
+
+    def frontier(self, target=None):
+        """
+        Free cells that share an edge with a block other than target, i.e. the
+        cells target may be dropped on. The current cell of target is occupied
+        and therefore never included.
+        """
+        if target is None:
+            return set(self.boundary)
+        col, row = self.cell(target)
+        only_target = [(col + dc, row + dr) for dc, dr in DIRECTIONS
+                       if self.is_free((col + dc, row + dr)) and self.touch[row + dr, col + dc] == 1]
+        return self.boundary.difference(only_target)
+
+    def allows(self, target, cell):
+        """ True if block target may be dropped on cell """
+        if not self.is_free(cell):
+            return False
+        col, row = self.cell(target)
+        own = abs(cell[0] - col) + abs(cell[1] - row) == 1
+        return self.touch[cell[1], cell[0]] > own
+
+    def snap(self, target, pos):
+        """
+        Returns the allowed cell closest to the screen position pos for block
+        target. The pointer is quantized to the lattice first, which is the
+        answer whenever that cell is allowed; otherwise the (at most 4n cells)
+        frontier is searched.
+        """
+        cell = to_lattice(pos)
+        if self.allows(target, cell):
+            return cell
+        x, y = to_lattice_float(pos)
+        return min(self.frontier(target), key=lambda c: (c[0] - x) ** 2 + (c[1] - y) ** 2)
+
+    def _place(self, i, cell):
+        col, row = cell
+        self.cells[i] = cell
+        self.grid[row, col] = i + 1
+        self.boundary.discard(cell)
+        for dc, dr in DIRECTIONS:
+            c = (col + dc, row + dr)
+            if in_bounds(c):
+                self.touch[c[1], c[0]] += 1
+                if self.grid[c[1], c[0]] == 0:
+                    self.boundary.add(c)
+
+    def _lift(self, i):
+        col, row = self.cell(i)
+        self.grid[row, col] = 0
+        for dc, dr in DIRECTIONS:
+            c = (col + dc, row + dr)
+            if in_bounds(c):
+                self.touch[c[1], c[0]] -= 1
+                if self.touch[c[1], c[0]] == 0:
+                    self.boundary.discard(c)
+        if self.touch[row, col] > 0:
+            self.boundary.add((col, row))
+
+    def move(self, i, cell):
+        """ puts block i on cell, updating the frontier incrementally """
+        self._lift(i)
+        self._place(i, cell)
+
+    def screen_pos(self, i):
+        return to_screen(self.cell(i))
+
+    def positions(self):
+        """ screen positions of all blocks, in block order """
+        return [to_screen(self.cell(i)) for i in range(len(self.cells))]
+
+    def removable(self):
+        """
+        Returns a list of booleans telling for each block whether it can be
+        lifted without splitting the remaining figure.
+
+        All articulation points of the occupancy graph are found in one iterative
+        depth-first pass (Tarjan), so the cost is linear in the number of blocks.
+        """
+        n = len(self.cells)
+        adj = [self.neighbours(i) for i in range(n)]
+
+        disc = [-1] * n
+        low = [0] * n
+        comp = [0] * n
+        cut = [False] * n
+        sizes = []
+        t = 0
+        for root in range(n):
+            if disc[root] != -1:
+                continue
+            disc[root] = low[root] = t
+            t += 1
+            size = 1
+            root_children = 0
+            comp[root] = len(sizes)
+            stack = [(root, -1, iter(adj[root]))]
+            while stack:
+                v, parent, it = stack[-1]
+                for w in it:
+                    if disc[w] == -1:
+                        disc[w] = low[w] = t
+                        t += 1
+                        size += 1
+                        comp[w] = len(sizes)
+                        stack.append((w, v, iter(adj[w])))
+                        break
+                    elif w != parent:
+                        low[v] = min(low[v], disc[w])
+                else:
+                    stack.pop()
+                    if parent == root:
+                        root_children += 1
+                    elif parent != -1:
+                        low[parent] = min(low[parent], low[v])
+                        if low[v] >= disc[parent]:
+                            cut[parent] = True
+            cut[root] = root_children > 1
+            sizes.append(size)
+
+        if len(sizes) == 1:
+            return [not c for c in cut]
+        # the figure is already split: only a stray block can be lifted to rejoin it
+        if len(sizes) == 2:
+            return [sizes[comp[i]] == 1 for i in range(n)]
+        return [False] * n
+
+
+def closest_node(node, nodes):
+    return nodes[np.linalg.norm(np.asarray(nodes, dtype=float) - node, axis=1).argmin()]
+
+
+def reset_positions(figure):
+    """
+    Translates a figure so that the block closest to the centre of its bounding
+    box is at (0, 0). Returns the sorted positions, or nan if figure is not a
+    list of positions; this is the 'gallery_normalized' column of the logs.
+    """
+    try:
+        # calculate centroid
+        x, y = zip(*figure)
+        centroid = (max(x) + min(x)) / 2., (max(y) + min(y)) / 2.
+        # find the node closest to the centroid
+        c_node = closest_node(centroid, figure)
+
+        # calculate the difference between centroid and center node
+        c_node_dif = [p * -1 for p in c_node]
+
+        # move all node coordinates by the distance
+        fig_update = [list(np.array(f) + np.array(c_node_dif)) for f in figure]
+        fig_update = [[float(round(f[0], 3)), float(round(f[1], 3))] for f in fig_update]  # plain floats for the log
+        fig_update.sort()
+    except Exception:
+        fig_update = np.nan
+
+    return fig_update
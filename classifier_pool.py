@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Running many classification calls at once.
+
+classify_all() hands the items to a thread pool, so up to `concurrency` remote
+calls are in flight, while a TokenBucket keeps the request rate under the
+API limit. Transient errors (timeouts, connection errors, 429 and 5xx) are
+retried with exponential backoff; results come back in the order of the
+items. Usage::
+    for item, result in zip(frames, classify_all(frames, analyze_frame, concurrency=8, rate=5)):
+        ...
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = ('APIConnectionError', 'APITimeoutError', 'RateLimitError', 'InternalServerError')
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst=1):
+        """
+        Allows on average rate calls of acquire() per second and up to burst at once.
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ blocks until a token is free and takes it """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_transient(error):
+    """ True for errors worth retrying: timeouts, lost connections, rate limits and server errors """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(error, 'status_code', None) in TRANSIENT_STATUS:
+        return True
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+def _retry_after(error):
+    """ seconds from a Retry-After header of the error's response, if any """
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def call_with_retries(fn, item, bucket=None, retries=5, backoff=1.0, max_backoff=30.0):
+    """ fn(item), waiting for bucket before every attempt and retrying transient errors """
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return fn(item)
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = _retry_after(e) or min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1)
+            time.sleep(delay)
+
+
+def classify_all(items, fn, concurrency=8, rate=None, retries=5):
+    """
+    Yields fn(item) for every item in order, with up to concurrency calls running at once.
+
+    :rate: maximum calls per second including retries, None for no limit
+    :retries: attempts after the first one for transient errors; other errors are raised at their item
+    """
+    bucket = TokenBucket(rate, burst=concurrency) if rate else None
+    executor = ThreadPoolExecutor(max(1, concurrency))
+    futures = [executor.submit(call_with_retries, fn, item, bucket, retries) for item in items]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # also on an error or an abandoned generator: do not start the remaining calls
+        executor.shutdown(wait=True, cancel_futures=True)
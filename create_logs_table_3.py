@@ -1,38 +1,135 @@
+import argparse
 import base64
 import csv
+import os
 import re
 from pathlib import Path
 
+import cv2
 import numpy as np
 import pandas as pd
-from openai import OpenAI
 
-client = OpenAI(api_key="")
+import batch_jobs
+import cut_info
+import motion_detector
+from classifier_pool import classify_all
+from response_cache import CACHE_FILE, ResponseCache
+
+# Insert your OpenAI API key here (or leave empty and set OPENAI_API_KEY)
+API_KEY = ""
+_client = None
+
+# What is sent per frame: the region with the screen and both players' arms, as
+# fractions (left, top, right, bottom) of the frame, downscaled so its longer side
+# is at most MAX_SIDE pixels and re-encoded as JPEG_QUALITY JPEG.
+ROI = (0.0, 0.0, 1.0, 1.0)
+MAX_SIDE = 768
+JPEG_QUALITY = 80
+
+MODEL = "gpt-4.1"
+PROMPT = ("who touches the screen: the person on the left, the person on the right, or none? explain. "
+          "write: first line - left or right or neither, then second line explain")
+
+
+def get_client(base_url=None):
+    """The OpenAI client, created on the first call; base_url points it at another server, e.g. a local stub."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        # max_retries=0: classifier_pool does the retries, each one through the rate limit
+        _client = OpenAI(api_key=API_KEY or None, base_url=base_url, max_retries=0)
+    return _client
 
 # ---------- Helpers ----------
-def encode_image(image_path: Path) -> str:
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
-def analyze_frame(image_path: Path):
-    base64_image = encode_image(image_path)
-    response = client.responses.create(
-        model="gpt-4.1",
-        input=[{
+def prepare_image(image_path: Path, roi=ROI, max_side=MAX_SIDE, quality=JPEG_QUALITY) -> bytes:
+    """JPEG bytes of the roi of the frame, downscaled to at most max_side pixels"""
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    h, w = image.shape[:2]
+    left, top, right, bottom = roi
+    image = image[int(top * h):int(round(bottom * h)), int(left * w):int(round(right * w))]
+    scale = max_side / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError(f"Could not encode image: {image_path}")
+    return buf.tobytes()
+
+def encode_image(image_path: Path, roi=ROI, max_side=MAX_SIDE, quality=JPEG_QUALITY) -> str:
+    return base64.b64encode(prepare_image(image_path, roi, max_side, quality)).decode("utf-8")
+
+def request_body(image: bytes) -> dict:
+    """Arguments of the Responses API call for one prepared image, also the body of a batch request"""
+    base64_image = base64.b64encode(image).decode("utf-8")
+    return {
+        "model": MODEL,
+        "input": [{
             "role": "user",
             "content": [
                 {"type": "input_text",
-                 "text": "who touches the screen: the person on the left, the person on the right, or none? explain. write: first line - left or right or neither, then second line explain"},
+                 "text": PROMPT},
                 {"type": "input_image",
                  "image_url": f"data:image/jpeg;base64,{base64_image}"},
             ],
         }],
-    )
-    output = response.output_text.strip().split("\n", 1)
+    }
+
+def parse_output(text: str):
+    """(explanation, answer) of the model's reply: the answer on the first line, the explanation after it"""
+    output = text.strip().split("\n", 1)
     answer = output[0].strip() if len(output) > 0 else ""
     explanation = output[1].strip() if len(output) > 1 else ""
     return explanation, answer
 
+def analyze_frame(image_path: Path, roi=ROI, max_side=MAX_SIDE, quality=JPEG_QUALITY, cache=None, cache_only=False):
+    """
+    (explanation, answer) for one frame. With a ResponseCache, an image, prompt and
+    model that were classified before are answered from it; with cache_only, frames
+    that are not cached get empty answers instead of a remote call.
+    """
+    image = prepare_image(image_path, roi, max_side, quality)
+    if cache is not None:
+        key = ResponseCache.key(image, PROMPT, MODEL)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    if cache_only:
+        print(f"[cache-only] {Path(image_path).name} is not cached")
+        return "", ""
+
+    response = get_client().responses.create(**request_body(image))
+    explanation, answer = parse_output(response.output_text)
+    if cache is not None:
+        cache.put(key, explanation, answer, MODEL)
+    return explanation, answer
+
+def openai_backend(args, cache):
+    """Asks the model about every frame image, see analyze_frame()."""
+    if not args.cache_only:
+        get_client(args.base_url)  # create the client once, before the worker threads use it
+    return lambda frame_path: analyze_frame(frame_path, args.roi, args.max_side, args.quality, cache, args.cache_only)
+
+def motion_backend(args, cache):
+    """Compares the motion left and right of the screen in the video around the frame's time, offline."""
+    motion = motion_detector.MotionEnergy.from_video(args.video, args.left_roi, args.right_roi)
+    offset = cut_info.offset(args.video)
+
+    def classify(frame_path):
+        t = extract_frame_time(Path(frame_path).stem)
+        if t is None:
+            return "no time in the frame name", "neither"
+        answer, confidence, left, right = motion.classify(t + offset, args.window, args.threshold)
+        return f"motion left {left:.2f}, right {right:.2f} (confidence {confidence:.2f})", answer
+    return classify
+
+# --backend name -> function(args, cache) returning classify(frame_path) -> (explanation, answer)
+BACKENDS = {
+    "openai": openai_backend,
+    "motion": motion_backend,
+}
+
 # Extract numeric timestamp from filename (e.g., frame_000123.jpg → 123, or 17.3)
 def extract_frame_time(filename_stem: str):
     m = re.search(r"(?i)(\d+)h(\d+)\.(\d+)(?:\.(\d+))?", filename_stem)  # 18h11.58.511
@@ -45,100 +142,236 @@ def extract_frame_time(filename_stem: str):
     nums = re.findall(r"\d+(?:\.\d+)?", filename_stem)
     return float(nums[-1]) if nums else None
 
-# ---------- Paths ----------
-frames_folder = Path("frames")
-frame_files = sorted(frames_folder.glob("*.jpg"))  # עדכני סיומת אם צריך
-csv_file = "logs.csv"
-logs_by_game_file = "logsByGame.csv"
-
-# ---------- Load game logs (;) ----------
-logs_df = pd.read_csv(logs_by_game_file, sep=';')
-
-# Validate columns
-required_cols = {"start_time", "end_time", "type"}
-if not required_cols.issubset(logs_df.columns):
-    raise ValueError(f"logsByGame.csv must have columns: {required_cols}")
-
-# Numeric times
-logs_df["start_time"] = pd.to_numeric(logs_df["start_time"], errors="coerce")
-logs_df["end_time"]   = pd.to_numeric(logs_df["end_time"],   errors="coerce")
-
-# Precompute floored/ceil times for matching
-logs_df["_start_floor"] = np.floor(logs_df["start_time"])
-logs_df["_end_ceil"]    = np.ceil(logs_df["end_time"])
-
-# Split to interval rows vs. point events (no end_time)
-interval_rows = logs_df[~logs_df["end_time"].isna()].copy()
-point_rows    = logs_df[ logs_df["end_time"].isna()].copy()
-
-# ---------- Write output ----------
-with open(csv_file, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["frame", "t_seconds", "explanation", "answer",
-                     "start_time", "end_time", "action"])
-
-    for frame_path in frame_files:
-        # time from filename
-        t = extract_frame_time(frame_path.stem)
-        t_sec = None if t is None else float(t)
-        # bin to integer second (floor)
-        frame_sec = None if t_sec is None else int(np.floor(t_sec))
-
-        explanation, answer = analyze_frame(frame_path)
-
-        start_out, end_out, action_out = "", "", ""
-
-        if frame_sec is not None:
-            # 1) interval match with floor/ceil bounds
-            hit = interval_rows[
-                (interval_rows["_start_floor"] <= frame_sec) &
-                (frame_sec < interval_rows["_end_ceil"])
-            ]
-
-            if not hit.empty:
-                row = hit.iloc[0]
-                action_type = str(row["type"]).strip().lower()
-                if action_type == "moveblock":
-                    action_out = "move block"
-                elif action_type == "added shape to gallery":
-                    action_out = "added shape to gallery"
-                else:
-                    action_out = row["type"]
+def load_game_logs(logs_by_game_file):
+    """Returns (interval_rows, point_rows) of logsByGame.csv, ready for match_frame()."""
+    logs_df = pd.read_csv(logs_by_game_file, sep=';')
+
+    # Validate columns
+    required_cols = {"start_time", "end_time", "type"}
+    if not required_cols.issubset(logs_df.columns):
+        raise ValueError(f"logsByGame.csv must have columns: {required_cols}")
+
+    # Numeric times
+    logs_df["start_time"] = pd.to_numeric(logs_df["start_time"], errors="coerce")
+    logs_df["end_time"]   = pd.to_numeric(logs_df["end_time"],   errors="coerce")
+
+    # Precompute floored/ceil times for matching
+    logs_df["_start_floor"] = np.floor(logs_df["start_time"])
+    logs_df["_end_ceil"]    = np.ceil(logs_df["end_time"])
+
+    # Split to interval rows vs. point events (no end_time)
+    interval_rows = logs_df[~logs_df["end_time"].isna()].copy()
+    point_rows    = logs_df[ logs_df["end_time"].isna()].copy()
+    return interval_rows, point_rows
+
+def match_frame(frame_sec, interval_rows, point_rows):
+    """Returns (start_time, end_time, action) of the game event at integer second frame_sec."""
+    start_out, end_out, action_out = "", "", ""
+
+    if frame_sec is not None:
+        # 1) interval match with floor/ceil bounds
+        hit = interval_rows[
+            (interval_rows["_start_floor"] <= frame_sec) &
+            (frame_sec < interval_rows["_end_ceil"])
+        ]
 
+        if not hit.empty:
+            row = hit.iloc[0]
+            action_type = str(row["type"]).strip().lower()
+            if action_type == "moveblock":
+                action_out = "move block"
+            elif action_type == "added shape to gallery":
+                action_out = "added shape to gallery"
+            else:
+                action_out = row["type"]
+
+            start_out = row["start_time"]
+            end_out   = row["end_time"]
+
+        else:
+            # 2) point events: match when floor(start_time) == frame_sec
+            pts = point_rows[np.floor(point_rows["start_time"]).astype("Int64") == frame_sec]
+            if not pts.empty:
+                row = pts.iloc[0]
+                action_type = str(row["type"]).strip().lower()
+                action_out = "added shape to gallery" if action_type == "added shape to gallery" else row["type"]
                 start_out = row["start_time"]
-                end_out   = row["end_time"]
+                end_out   = ""  # no end_time
 
             else:
-                # 2) point events: match when floor(start_time) == frame_sec
-                pts = point_rows[np.floor(point_rows["start_time"]).astype("Int64") == frame_sec]
-                if not pts.empty:
-                    row = pts.iloc[0]
+                # 3) fallback: nearest interval by integer distance
+                if not interval_rows.empty:
+                    tmp = interval_rows.copy()
+                    # distance in integer-second space
+                    tmp["_dist"] = tmp.apply(
+                        lambda r: 0 if (r["_start_floor"] <= frame_sec < r["_end_ceil"])
+                        else min(abs(frame_sec - r["_start_floor"]), abs(frame_sec - r["_end_ceil"])),
+                        axis=1
+                    )
+                    row = tmp.sort_values("_dist").iloc[0]
                     action_type = str(row["type"]).strip().lower()
-                    action_out = "added shape to gallery" if action_type == "added shape to gallery" else row["type"]
+                    if action_type == "moveblock":
+                        action_out = "move block"
+                    elif action_type == "added shape to gallery":
+                        action_out = "added shape to gallery"
+                    else:
+                        action_out = row["type"]
                     start_out = row["start_time"]
-                    end_out   = ""  # no end_time
-
-                else:
-                    # 3) fallback: nearest interval by integer distance
-                    if not interval_rows.empty:
-                        tmp = interval_rows.copy()
-                        # distance in integer-second space
-                        tmp["_dist"] = tmp.apply(
-                            lambda r: 0 if (r["_start_floor"] <= frame_sec < r["_end_ceil"])
-                            else min(abs(frame_sec - r["_start_floor"]), abs(frame_sec - r["_end_ceil"])),
-                            axis=1
-                        )
-                        row = tmp.sort_values("_dist").iloc[0]
-                        action_type = str(row["type"]).strip().lower()
-                        if action_type == "moveblock":
-                            action_out = "move block"
-                        elif action_type == "added shape to gallery":
-                            action_out = "added shape to gallery"
-                        else:
-                            action_out = row["type"]
-                        start_out = row["start_time"]
-                        end_out   = row["end_time"]
-
-        # write row
-        writer.writerow([frame_path.name, t_sec, explanation, answer, start_out, end_out, action_out])
-        print(f"Processed {frame_path.name}: answer={answer}, action={action_out}, t={t_sec}, sec={frame_sec}")
\ No newline at end of file
+                    end_out   = row["end_time"]
+
+    return start_out, end_out, action_out
+
+def write_logs(csv_file, frame_files, results, interval_rows, point_rows):
+    """Writes logs.csv: one row per frame with its (explanation, answer) from results and the matched game event."""
+    with open(csv_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "t_seconds", "explanation", "answer",
+                         "start_time", "end_time", "action"])
+
+        for frame_path, (explanation, answer) in zip(frame_files, results):
+            # time from filename
+            t = extract_frame_time(frame_path.stem)
+            t_sec = None if t is None else float(t)
+            # bin to integer second (floor)
+            frame_sec = None if t_sec is None else int(np.floor(t_sec))
+
+            start_out, end_out, action_out = match_frame(frame_sec, interval_rows, point_rows)
+
+            # write row
+            writer.writerow([frame_path.name, t_sec, explanation, answer, start_out, end_out, action_out])
+            print(f"Processed {frame_path.name}: answer={answer}, action={action_out}, t={t_sec}, sec={frame_sec}")
+
+def run_batch(args, cache, frame_files, csv_file, interval_rows, point_rows):
+    """
+    --batch: export writes one request per frame (custom_id = frame file name), submit
+    starts the job, poll waits for it and downloads the results, ingest writes logs.csv
+    from them with the same matching as a direct run; run does all four. With a
+    ResponseCache, cached frames are not exported but answered from the cache at
+    ingest, and the batch results are added to it.
+    """
+    steps = ["export", "submit", "poll", "ingest"] if args.batch == "run" else [args.batch]
+    results_file = args.batch_results
+
+    def key(frame_path):
+        return ResponseCache.key(prepare_image(frame_path, args.roi, args.max_side, args.quality), PROMPT, MODEL)
+
+    if "export" in steps:
+        todo = [p for p in frame_files if cache is None or cache.get(key(p)) is None]
+        requests = ((p.name, request_body(prepare_image(p, args.roi, args.max_side, args.quality))) for p in todo)
+        n = batch_jobs.write_requests(args.batch_requests, requests)
+        print(f"Wrote {n} requests to {args.batch_requests}, {len(frame_files) - len(todo)} frames are cached")
+        if n == 0 and args.batch == "run":
+            steps, results_file = ["ingest"], None  # nothing to submit; answer every frame from the cache
+    batches = None
+    if "submit" in steps or "poll" in steps:
+        if args.batch_service == "local":
+            batches = batch_jobs.LocalBatches()
+        else:
+            batches = batch_jobs.OpenAIBatches(get_client(args.base_url))
+    if "submit" in steps:
+        job_id = batch_jobs.submit(batches, args.batch_requests, args.batch_job)
+        print(f"Submitted batch {job_id}")
+    if "poll" in steps:
+        status = batch_jobs.poll(batches, args.batch_job, args.batch_results, args.poll_interval)
+        if status != "completed":
+            raise SystemExit(f"Batch ended with status {status}")
+    if "ingest" in steps:
+        replies = batch_jobs.read_results(results_file) if results_file and os.path.isfile(results_file) else {}
+        results = []
+        for p in frame_files:
+            if replies.get(p.name) is not None:
+                result = parse_output(replies[p.name])
+                if cache is not None:
+                    cache.put(key(p), *result, MODEL)
+            else:
+                result = cache.get(key(p)) if cache is not None else None
+            results.append(result)
+        missing = [p.name for p, result in zip(frame_files, results) if result is None]
+        if missing:
+            print(f"[WARN] {len(missing)} frames have no result, e.g. {missing[0]}")
+        results = [("", "") if result is None else result for result in results]
+        try:
+            write_logs(csv_file, frame_files, results, interval_rows, point_rows)
+        finally:
+            if cache is not None:
+                cache.save()
+
+def main():
+    ap = argparse.ArgumentParser(description="Classify who touches the screen in every frame and match it to the game logs.")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default="openai",
+                    help="openai: ask the model about every frame (default); motion: offline motion detector on the video.")
+    ap.add_argument("--roi", type=float, nargs=4, default=ROI, metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                    help="Region with the screen and both players' arms, as fractions of the frame (default: all).")
+    ap.add_argument("--max-side", type=int, default=MAX_SIDE,
+                    help=f"Longer side of the image sent per frame in pixels (default: {MAX_SIDE}).")
+    ap.add_argument("--quality", type=int, default=JPEG_QUALITY,
+                    help=f"JPEG quality of the image sent per frame (default: {JPEG_QUALITY}).")
+    ap.add_argument("--concurrency", type=int, default=8, help="Frames classified at the same time (default: 8).")
+    ap.add_argument("--rate", type=float, default=0,
+                    help="Maximum requests per second, retries included; 0 for no limit (default: 0).")
+    ap.add_argument("--retries", type=int, default=5,
+                    help="Retries with backoff on timeouts, rate limits and server errors (default: 5).")
+    ap.add_argument("--base-url", default=None, help="API base URL, e.g. of a local stub server.")
+    ap.add_argument("--cache", default=CACHE_FILE, help=f"Response cache shared between runs (default: {CACHE_FILE}).")
+    ap.add_argument("--cache-max-entries", type=int, default=100000,
+                    help="Responses kept in the cache, least recently used dropped first (default: 100000).")
+    ap.add_argument("--cache-max-age", type=float, default=180, help="Days a response is kept (default: 180).")
+    ap.add_argument("--cache-only", action="store_true",
+                    help="Make no remote calls: answer from the cache, leave uncached frames empty.")
+    ap.add_argument("--no-cache", action="store_true", help="Classify every frame again, without the cache.")
+    ap.add_argument("--video", default="cut_video.mp4", help="Video for the motion backend (default: cut_video.mp4).")
+    ap.add_argument("--left-roi", type=float, nargs=4, default=motion_detector.LEFT_ROI,
+                    metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                    help="Motion backend: region of the left player's arm next to the screen, as fractions of the frame.")
+    ap.add_argument("--right-roi", type=float, nargs=4, default=motion_detector.RIGHT_ROI,
+                    metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                    help="Motion backend: region of the right player's arm next to the screen.")
+    ap.add_argument("--window", type=float, default=motion_detector.WINDOW,
+                    help=f"Motion backend: seconds before and after the frame (default: {motion_detector.WINDOW}).")
+    ap.add_argument("--threshold", type=float, default=motion_detector.THRESHOLD,
+                    help=f"Motion backend: motion below which the answer is neither (default: {motion_detector.THRESHOLD}).")
+    ap.add_argument("--batch", choices=("export", "submit", "poll", "ingest", "run"),
+                    help="Classify with a batch job instead of direct calls: export the requests, submit them, "
+                         "poll for the results, ingest them into logs.csv, or run all four.")
+    ap.add_argument("--batch-service", choices=("openai", "local"), default="openai",
+                    help="openai: the Batch API (default); local: a stand-in on the local disk for testing.")
+    ap.add_argument("--batch-requests", default=batch_jobs.REQUESTS_FILE,
+                    help=f"Batch input file (default: {batch_jobs.REQUESTS_FILE}).")
+    ap.add_argument("--batch-results", default=batch_jobs.RESULTS_FILE,
+                    help=f"Batch results file (default: {batch_jobs.RESULTS_FILE}).")
+    ap.add_argument("--batch-job", default=batch_jobs.JOB_FILE,
+                    help=f"File with the id of the submitted job (default: {batch_jobs.JOB_FILE}).")
+    ap.add_argument("--poll-interval", type=float, default=60, help="Seconds between batch status checks (default: 60).")
+    args = ap.parse_args()
+    cache = None
+    if args.backend == "openai" and not args.no_cache:
+        cache = ResponseCache(args.cache, args.cache_max_entries, args.cache_max_age)
+
+    # ---------- Paths ----------
+    frames_folder = Path("frames")
+    frame_files = sorted(frames_folder.glob("*.jpg"))  # עדכני סיומת אם צריך
+    csv_file = "logs.csv"
+    logs_by_game_file = "logsByGame.csv"
+
+    # ---------- Load game logs (;) ----------
+    interval_rows, point_rows = load_game_logs(logs_by_game_file)
+
+    if args.batch:
+        run_batch(args, cache, frame_files, csv_file, interval_rows, point_rows)
+        return
+
+    # ---------- Classify (concurrently, results in frame order) ----------
+    classify = BACKENDS[args.backend](args, cache)
+    results = classify_all(frame_files, classify,
+                           concurrency=args.concurrency, rate=args.rate or None, retries=args.retries)
+
+    # ---------- Write output ----------
+    try:
+        write_logs(csv_file, frame_files, results, interval_rows, point_rows)
+    finally:
+        if cache is not None:
+            cache.save()  # also keep what was classified before an error
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import os
 import shutil
 import subprocess
 
+import cut_info
+
 # === Helper to format time for SRT ===
 def format_time(t):
     if isinstance(t, pd.Timestamp):
@@ -26,9 +28,13 @@ def create_subtitles(player_left, player_right,
                      video_path="cut_video.mp4",
                      srt_path="subtitles.srt",
                      output_video_path="video_with_subs.mp4",
-                     destination_dir="./output"):
+                     destination_dir="./output",
+                     offset=None):
 
     os.makedirs(destination_dir, exist_ok=True)
+    # game time -> time in the cut video, see cut_info
+    if offset is None:
+        offset = cut_info.offset(video_path)
 
     # === Read CSV ===
     df = pd.read_csv(csv_path)
@@ -39,6 +45,9 @@ def create_subtitles(player_left, player_right,
         "neither": "Can't recognize action"
     })
     df = df.sort_values(by="start_time").reset_index(drop=True)
+    if offset:
+        df["start_time"] = pd.to_numeric(df["start_time"]) + offset
+        df["end_time"] = pd.to_numeric(df["end_time"]) + offset
 
     # === Write .srt file ===
     srt_full_path = os.path.join(destination_dir, srt_path)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Where the game starts in the cut video.
+
+recognize_start_time_1.py cuts game.mp4 by stream copy, which can only start
+at a keyframe, so cut_video.mp4 may begin a little before the welcome screen.
+That offset is stored next to the video as '<video>.json'. A time in the game
+logs plus offset() is the same moment in the cut video. Videos without the
+file, e.g. re-encoded cuts, start at the welcome screen and have offset 0.
+"""
+import json
+import os
+
+
+def sidecar(video_path):
+    """ 'cut_video.mp4' -> 'cut_video.json' """
+    return os.path.splitext(video_path)[0] + '.json'
+
+
+def save(video_path, **info):
+    """ writes the cut info of video_path, e.g. save('cut_video.mp4', offset=0.4, source='game.mp4') """
+    filename = sidecar(video_path)
+    tmp = filename + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+def load(video_path):
+    """ the cut info of video_path as a dict, empty if there is none """
+    filename = sidecar(video_path)
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def offset(video_path):
+    """ seconds from the start of video_path to the welcome screen """
+    return float(load(video_path).get('offset', 0.0))
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Catalogue of all free decominoes.
+
+Every gallery figure is 10 edge-connected blocks, i.e. one of the 4655 free
+decominoes (36446 when rotated and reflected copies count as different).
+generate() enumerates them once and stores them sorted by their canonical
+code from shapes.py, which makes the ids stable, together with precomputed
+descriptors. Catalogue memory-maps that file and classifies a figure with a
+single dict lookup. Usage::
+    catalogue = Catalogue()             # generates decominoes.npy on first use
+    shape_id = catalogue.classify(row['gallery_normalized'])
+    catalogue.records[shape_id]['holes']
+"""
+import os
+
+import numpy as np
+
+import shapes
+
+CATALOGUE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decominoes.npy')
+SIZE = 10
+
+RECORD = np.dtype([
+    ('width', 'u1'),  # bounding box of the canonical form
+    ('height', 'u1'),
+    ('mask', '<u8'),  # canonical form, bit y * width + x set for every block
+    ('symmetry', 'u1'),  # index into SYMMETRY_GROUPS
+    ('perimeter', 'u1'),  # number of block edges on the outline, holes included
+    ('holes', 'u1'),  # number of enclosed empty regions
+])
+
+# subgroups of the symmetries of the square, named by the rotations and mirrors that leave a shape unchanged
+SYMMETRY_GROUPS = ('C1', 'D1', 'D1 diagonal', 'C2', 'D2', 'D2 diagonal', 'C4', 'D4')
+# which of shapes.SYMMETRIES leave the shape unchanged -> SYMMETRY_GROUPS index
+_STABILIZERS = {
+    (0,): 0,
+    (0, 4): 1, (0, 5): 1,
+    (0, 6): 2, (0, 7): 2,
+    (0, 2): 3,
+    (0, 2, 4, 5): 4,
+    (0, 2, 6, 7): 5,
+    (0, 1, 2, 3): 6,
+    (0, 1, 2, 3, 4, 5, 6, 7): 7,
+}
+
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def decode(width, height, mask):
+    """ canonical code -> (n, 2) int array of (x, y) cells """
+    bits = [b for b in range(int(width) * int(height)) if int(mask) >> b & 1]
+    return np.array([(b % int(width), b // int(width)) for b in bits], dtype=int)
+
+
+def enumerate_free(size=SIZE):
+    """ sorted canonical codes of all free polyominoes of size blocks, grown one block at a time """
+    level = {shapes.canonical_code([(0, 0)]): ((0, 0),)}
+    for _ in range(size - 1):
+        grown = {}
+        for cells in level.values():
+            occupied = set(cells)
+            for x, y in cells:
+                for dx, dy in NEIGHBOURS:
+                    c = (x + dx, y + dy)
+                    if c in occupied:
+                        continue
+                    new = cells + (c,)
+                    code = shapes.canonical_code(new)
+                    if code not in grown:
+                        grown[code] = new
+        level = grown
+    return sorted(level)
+
+
+def symmetry(cells):
+    """ SYMMETRY_GROUPS index of the rotations and reflections that map cells onto themselves """
+    cells = np.asarray(cells, dtype=int)
+    original = sorted(map(tuple, (cells - cells.min(axis=0)).tolist()))
+    fixed = []
+    for i, sym in enumerate(shapes.SYMMETRIES):
+        moved = cells.dot(sym.T)
+        moved -= moved.min(axis=0)
+        if sorted(map(tuple, moved.tolist())) == original:
+            fixed.append(i)
+    return _STABILIZERS[tuple(fixed)]
+
+
+def perimeter(cells):
+    occupied = set(map(tuple, np.asarray(cells).tolist()))
+    shared = sum((x + 1, y) in occupied for x, y in occupied) + sum((x, y + 1) in occupied for x, y in occupied)
+    return 4 * len(occupied) - 2 * shared
+
+
+def holes(cells):
+    """ number of edge-connected empty regions that cannot reach the outside """
+    cells = np.asarray(cells, dtype=int)
+    cells = cells - cells.min(axis=0) + 1
+    w, h = cells.max(axis=0) + 2
+    empty = np.ones((h, w), dtype=bool)
+    empty[cells[:, 1], cells[:, 0]] = False
+    regions = 0
+    seen = np.zeros_like(empty)
+    for y0 in range(h):
+        for x0 in range(w):
+            if not empty[y0, x0] or seen[y0, x0]:
+                continue
+            outside = False
+            stack = [(x0, y0)]
+            seen[y0, x0] = True
+            while stack:
+                x, y = stack.pop()
+                if x in (0, w - 1) or y in (0, h - 1):
+                    outside = True
+                for dx, dy in NEIGHBOURS:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < w and 0 <= ny < h and empty[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        stack.append((nx, ny))
+            regions += not outside
+    return regions
+
+
+def generate(filename=CATALOGUE, size=SIZE):
+    """ enumerates the catalogue, writes it as a .npy file and returns it """
+    codes = enumerate_free(size)
+    records = np.zeros(len(codes), dtype=RECORD)
+    for i, (w, h, mask) in enumerate(codes):
+        cells = decode(w, h, mask)
+        records[i] = (w, h, mask, symmetry(cells), perimeter(cells), holes(cells))
+    tmp = filename + '.tmp.npy'
+    np.save(tmp, records)
+    os.replace(tmp, filename)
+    return records
+
+
+class Catalogue(object):
+    def __init__(self, filename=CATALOGUE):
+        """
+        Loads the catalogue memory-mapped, generating it first if the file does not exist.
+
+        :records: RECORD array; the id of a shape is its index
+        """
+        if not os.path.isfile(filename):
+            generate(filename)
+        self.records = np.load(filename, mmap_mode='r')
+        self.ids = {shapes.format_hash(code): i for i, code in enumerate(zip(
+            self.records['width'].tolist(), self.records['height'].tolist(), self.records['mask'].tolist()))}
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, key):
+        """ id of a shapes.shape_hash() key, or -1 if it is not a decomino """
+        return self.ids.get(key, -1)
+
+    def classify(self, coords):
+        """ id of the shape of a figure given as screen positions, or -1 if it is not a decomino """
+        return self.ids.get(shapes.shape_hash(coords), -1)
+
+    def cells(self, shape_id):
+        """ canonical (x, y) lattice cells of a shape """
+        r = self.records[shape_id]
+        return decode(r['width'], r['height'], r['mask'])
+
+    def describe(self, shape_id):
+        """ the descriptors of a shape as a dict """
+        r = self.records[shape_id]
+        return {
+            'id': int(shape_id),
+            'hash': shapes.format_hash((int(r['width']), int(r['height']), int(r['mask']))),
+            'width': int(r['width']),
+            'height': int(r['height']),
+            'symmetry': SYMMETRY_GROUPS[r['symmetry']],
+            'perimeter': int(r['perimeter']),
+            'holes': int(r['holes'])}
+
+
+if __name__ == '__main__':
+    records = generate()
+    print(f"Wrote {len(records)} decominoes to {CATALOGUE}")
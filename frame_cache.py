@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of extracted frames shared across pipeline runs.
+
+A frame is stored under the hash of the video content, the number of the
+frame that a game time selects and the encoding parameters, so reruns on an
+unchanged cut_video.mp4 copy frames from the cache instead of decoding them,
+and a new video never hits old frames. Files are touched when they are used,
+and evict() deletes the least recently used ones once the cache is larger
+than max_bytes. Usage::
+    cache = FrameCache('.frame_cache')
+    frame_extraction.extract_frames('cut_video.mp4', times, 'frames', offset, cache=cache)
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import cv2
+
+from frame_extraction import frame_index
+
+CACHE_DIR = '.frame_cache'
+PARAMS = 'jpg'  # changes whenever the stored frames would change, e.g. a crop or another format
+CHUNK = 1 << 20
+
+
+def file_hash(filename):
+    """ sha256 hex digest of the content of filename """
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FrameCache(object):
+    def __init__(self, directory=CACHE_DIR, max_bytes=2 * 1024 ** 3):
+        """
+        :directory: created if it does not exist
+        :max_bytes: size evict() shrinks the cache to
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._videos = os.path.join(directory, 'videos.json')
+
+    def video_hash(self, video_path):
+        """ content hash of video_path; remembered per path, size and modification time to skip rehashing """
+        known = {}
+        if os.path.isfile(self._videos):
+            with open(self._videos, encoding='utf-8') as f:
+                known = json.load(f)
+        st = os.stat(video_path)
+        name = os.path.abspath(video_path)
+        entry = known.get(name)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+
+        known[name] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': file_hash(video_path)}
+        tmp = self._videos + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(known, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._videos)
+        return known[name]['sha256']
+
+    def keys(self, video_path, times, offset=0.0):
+        """ {time: key} of the frames at game times in video_path """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Error opening video file: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        video = self.video_hash(video_path)
+        return {t: hashlib.sha256(f"{video}:{frame_index(t + offset, fps)}:{PARAMS}".encode()).hexdigest()
+                for t in times}
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.jpg')
+
+    def get(self, key, dest):
+        """ copies the cached frame to dest and returns True, or False if it is not cached """
+        path = self.path(key)
+        try:
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            return False
+        os.utime(path)  # most recently used
+        return True
+
+    def put(self, key, src):
+        """ stores the frame file src """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """ deletes the least recently used frames until the cache holds at most max_bytes. Returns how many. """
+        files = []
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                files.extend((e.stat().st_mtime_ns, e.stat().st_size, e.path)
+                             for e in os.scandir(sub.path) if e.name.endswith('.jpg'))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
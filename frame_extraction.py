@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Reading many frames of one video in a single pass.
+
+The frame steps need a few frames for every turn of a session. Instead of
+opening and seeking the video once per frame, read_frames() sorts the times
+and decodes the video once from the start, only converting the frames it
+returns. With processes, the times are split into shards of equal time span
+and every worker process seeks to the start of one shard and decodes it; the
+saved frames are the same as in a serial run. Usage::
+    paths = frame_extraction.extract_frames('cut_video.mp4', [5.36, 7.2], 'frames', cut_info.offset('cut_video.mp4'))
+"""
+import multiprocessing
+import os
+
+import cv2
+
+
+def frame_name(time_sec):
+    """ 'frame_at_5.360s.jpg'; create_logs_table_3.extract_frame_time() reads the time back """
+    return f"frame_at_{time_sec:.3f}s.jpg"
+
+
+def frame_index(time_sec, fps):
+    """ number of the frame shown at time_sec, the one cv2 seeks to with CAP_PROP_POS_MSEC """
+    return max(0, int(time_sec * fps + 0.5))
+
+
+def read_frames(video_path, times, offset=0.0, seek=False):
+    """
+    Yields (time, BGR frame) for every distinct time in ascending order.
+
+    :times: game times in seconds
+    :offset: seconds from the start of the video to game time 0, see cut_info
+    :seek: seek to the first frame instead of decoding from the start of the video
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    times = sorted(set(times))
+
+    position = 0  # number of the frame the next grab() decodes
+    if seek and times:
+        position = frame_index(times[0] + offset, fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+    frame = None
+    try:
+        for time_sec in times:
+            index = frame_index(time_sec + offset, fps)
+            if index >= position:
+                while position <= index:
+                    if not cap.grab():
+                        raise ValueError(f"Could not read frame at {time_sec} seconds.")
+                    position += 1
+                success, frame = cap.retrieve()
+                if not success:
+                    raise ValueError(f"Could not read frame at {time_sec} seconds.")
+            yield time_sec, frame  # an earlier index is the frame of the previous time
+    finally:
+        cap.release()
+
+
+def shards(times, n):
+    """ the distinct times in ascending order, split into at most n runs that each cover an equal time span """
+    times = sorted(set(times))
+    if n <= 1 or len(times) < 2:
+        return [times] if times else []
+    span = (times[-1] - times[0]) / n
+    runs = [[] for _ in range(n)]
+    for t in times:
+        runs[min(n - 1, int((t - times[0]) / span))].append(t)
+    return [run for run in runs if run]
+
+
+def _save_frames(job):
+    video_path, times, output_dir, offset, seek = job
+    for time_sec, frame in read_frames(video_path, times, offset, seek):
+        cv2.imwrite(os.path.join(output_dir, frame_name(time_sec)), frame)
+
+
+def extract_frames(video_path, times, output_dir, offset=0.0, processes=1, cache=None):
+    """
+    Saves the frame at every game time in times as a JPEG named frame_name(time)
+    in output_dir. Returns the paths in the order of times.
+
+    :processes: worker processes, each decoding one shard of the times; None for all cores
+    :cache: a frame_cache.FrameCache; only frames it does not hold yet are decoded
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {t: os.path.join(output_dir, frame_name(t)) for t in times}
+    todo = sorted(paths)
+    if cache is not None:
+        keys = cache.keys(video_path, todo, offset)
+        todo = [t for t in todo if not cache.get(keys[t], paths[t])]
+
+    processes = processes or os.cpu_count()
+    jobs = [(video_path, shard, output_dir, offset, True) for shard in shards(todo, processes)]
+    if len(jobs) == 1 or (jobs and processes == 1):
+        _save_frames((video_path, todo, output_dir, offset, False))
+    elif jobs:
+        with multiprocessing.Pool(len(jobs)) as pool:
+            pool.map(_save_frames, jobs)
+
+    if cache is not None and todo:
+        for t in todo:
+            cache.put(keys[t], paths[t])
+        cache.evict()
+    return [paths[t] for t in times]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Reading the ';' separated session logs written by CreativeForaging.py.
+
+Older logs take their header from the first move and write gallery rows
+with a 'time' key and one column less, so those rows are shifted against
+the header. read_log() undoes that and parses the position columns.
+"""
+import csv
+import json
+import math
+import re
+
+# columns of a session log, in order
+FIELDS = ('date', 'id', 'condition', 'phase', 'type', 'start_time', 'end_time', 'unit',
+          'end_position', 'all_positions', 'gallery_shape_number', 'gallery', 'gallery_normalized')
+
+# key order of the gallery rows written before the schema was fixed
+LEGACY_GALLERY_FIELDS = ('date', 'id', 'condition', 'phase', 'type', 'time', 'unit', 'end_position',
+                         'all_positions', 'gallery_shape_number', 'gallery', 'gallery_normalized')
+
+POSITION_FIELDS = ('end_position', 'all_positions', 'gallery', 'gallery_normalized')
+NUMBER_FIELDS = ('start_time', 'end_time', 'unit', 'gallery_shape_number')
+
+MOVE = 'moveblock'
+GALLERY = 'added shape to gallery'
+
+
+# numpy 2 scalars as the game wrote them into 'gallery_normalized', e.g. np.float64(-0.28)
+NUMPY_SCALAR = re.compile(r'np\.\w+\(([^()]*)\)')
+
+
+def parse_positions(value):
+    """ '[[-0.175, 0.07], ...]' -> list of [x, y]; None for 'nan' and empty cells """
+    if value is None or not value.strip() or value.strip() == 'nan':
+        return None
+    return json.loads(NUMPY_SCALAR.sub(r'\1', value))
+
+
+def parse_number(value):
+    """ float of a cell, None for 'nan' and empty cells """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def read_log(filename):
+    """
+    Returns the rows of a session log as dicts with the keys in FIELDS.
+    Times and unit numbers are floats, positions are lists, missing values are None.
+    """
+    rows = []
+    with open(filename, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = next(reader)
+        for values in reader:
+            if not values:
+                continue
+            if len(values) == len(LEGACY_GALLERY_FIELDS) and len(header) == len(FIELDS):
+                row = dict(zip(LEGACY_GALLERY_FIELDS, values))
+                row['start_time'] = row.pop('time')
+            else:
+                row = dict(zip(header, values))
+            for key in FIELDS:
+                row.setdefault(key, None)
+            for key in POSITION_FIELDS:
+                row[key] = parse_positions(row[key])
+            for key in NUMBER_FIELDS:
+                row[key] = parse_number(row[key])
+            if row['unit'] is not None:
+                row['unit'] = int(row['unit'])
+            rows.append(row)
+    return rows
+
+
+def session_id(rows, default=''):
+    """ '<id>_<date>' of the first row, which names the session """
+    if not rows:
+        return default
+    return '{}_{}'.format(rows[0]['id'], rows[0]['date'])
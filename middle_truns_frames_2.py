@@ -1,59 +1,54 @@
+import argparse
 import math
-import os
-import cv2
 import pandas as pd
 
+import cut_info
+from frame_cache import CACHE_DIR, FrameCache
+from frame_extraction import extract_frames
 
-def extract_frame_at_time(video_path, time_sec, output_dir):
-    """
-    Extracts a frame from the video at the specified time (in seconds)
-    and saves it as a JPEG in the output directory.
-    """
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError(f"Error opening video file: {video_path}")
-
-    cap.set(cv2.CAP_PROP_POS_MSEC, time_sec * 1000)
-    success, frame = cap.read()
-
-    if not success:
-        raise ValueError(f"Could not read frame at {time_sec} seconds.")
 
-    os.makedirs(output_dir, exist_ok=True)
-    output_filename = f"frame_at_{int(time_sec)}s.jpg"
-    output_path = os.path.join(output_dir, output_filename)
-
-    cv2.imwrite(output_path, frame)
-    cap.release()
-    return output_path
-
-
-def extract_frames_from_csv(csv_filename, video_filename, output_dir='frames'):
+def extract_frames_from_csv(csv_filename, video_filename, output_dir='frames', offset=None, processes=1,
+                            cache=None):
     """
     Reads a CSV file with 'start_time' and 'end_time' columns,
     calculates midpoints (or uses start_time if end_time is NaN),
-    and extracts frames from the video.
+    and extracts frames from the video in a single pass.
+    offset defaults to the one saved with the cut video, see cut_info.
+    With processes > 1 (None: all cores) the video is decoded in parallel shards.
+    Frames found in cache (a FrameCache) are copied instead of decoded.
     """
+    if offset is None:
+        offset = cut_info.offset(video_filename)
     df = pd.read_csv(csv_filename, delimiter=';')
 
-    extracted_files = []
+    times = []
     for start, end in zip(df['start_time'], df['end_time']):
         if not pd.isna(start):
             if pd.isna(end):
                 time = float(start)
             else:
                 time = (float(start) + float(end)) / 2
-            extracted_files.append(extract_frame_at_time(video_filename, time, output_dir))
+            times.append(time)
 
-    return extracted_files
+    return extract_frames(video_filename, times, output_dir, offset, processes, cache)
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Extract frames of every turn in logsByGame.csv from cut_video.mp4.")
+    ap.add_argument("--processes", type=int, default=1,
+                    help="Worker processes decoding shards of the video in parallel, 0 for all cores (default: 1).")
+    ap.add_argument("--cache", default=CACHE_DIR, help=f"Frame cache shared between runs (default: {CACHE_DIR}).")
+    ap.add_argument("--cache-size", type=int, default=2048, help="Maximum size of the frame cache in MB (default: 2048).")
+    ap.add_argument("--no-cache", action="store_true", help="Decode every frame, without the frame cache.")
+    args = ap.parse_args()
+    cache = None if args.no_cache else FrameCache(args.cache, args.cache_size * 1024 ** 2)
+
     csv_filename = 'logsByGame.csv'  # Change this to your CSV file
     video_filename = 'cut_video.mp4'  # Change this to your video file
     output_dir = 'frames'  # Optional: change output directory
 
-    extracted_files = extract_frames_from_csv(csv_filename, video_filename, output_dir)
+    extracted_files = extract_frames_from_csv(csv_filename, video_filename, output_dir,
+                                              processes=args.processes or None, cache=cache)
     print(f"Extracted {len(extracted_files)} frames:")
     for f in extracted_files:
         print(f"  {f}")
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Offline "who touched the screen" detector.
+
+The players sit left and right of the screen, so whoever touches it moves an
+arm through the region on their side. MotionEnergy decodes the video once and
+keeps, for every frame, the mean absolute grey-level difference to the
+previous frame in a left and a right region, ignoring changes up to NOISE
+(sensor and compression noise). classify() compares the two over a short
+window around a time: the side with more motion touched, unless both stay
+under a threshold. Usage::
+    motion = MotionEnergy.from_video('cut_video.mp4')
+    answer, confidence, left, right = motion.classify(12.3)   # seconds in the video
+"""
+import cv2
+import numpy as np
+
+from frame_extraction import frame_index
+
+# regions next to the screen as fractions (left, top, right, bottom) of the frame
+LEFT_ROI = (0.0, 0.0, 0.35, 1.0)
+RIGHT_ROI = (0.65, 0.0, 1.0, 1.0)
+WIDTH = 160  # frames are compared at this width
+WINDOW = 0.5  # seconds before and after the time
+NOISE = 8  # grey-level changes up to this count as no change
+THRESHOLD = 0.1  # mean grey-level change per pixel below which nobody moved
+
+
+def _slice(roi, w, h):
+    left, top, right, bottom = roi
+    return slice(int(top * h), max(int(top * h) + 1, int(round(bottom * h)))), \
+        slice(int(left * w), max(int(left * w) + 1, int(round(right * w))))
+
+
+class MotionEnergy(object):
+    def __init__(self, fps, left, right):
+        """
+        :left: motion energy of every frame in the left region, 0 for the first frame
+        :right: the same for the right region
+        """
+        self.fps = fps
+        self.left = np.asarray(left, dtype=float)
+        self.right = np.asarray(right, dtype=float)
+
+    @classmethod
+    def from_video(cls, video_path, left_roi=LEFT_ROI, right_roi=RIGHT_ROI, width=WIDTH):
+        """ decodes video_path once and measures the motion in both regions of every frame """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Error opening video file: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        left, right = [], []
+        previous = None
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            h, w = frame.shape[:2]
+            size = (width, max(1, round(h * width / w)))
+            grey = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+            if previous is None:
+                ls, rs = _slice(left_roi, *size), _slice(right_roi, *size)
+                left.append(0.)
+                right.append(0.)
+            else:
+                diff = cv2.threshold(cv2.absdiff(grey, previous), NOISE, 0, cv2.THRESH_TOZERO)[1]
+                left.append(float(diff[ls].mean()))
+                right.append(float(diff[rs].mean()))
+            previous = grey
+        cap.release()
+        return cls(fps, left, right)
+
+    def energy(self, time_sec, window=WINDOW):
+        """ mean motion (left, right) over the frames from time_sec - window to time_sec + window """
+        i0 = frame_index(time_sec - window, self.fps)
+        i1 = min(len(self.left), frame_index(time_sec + window, self.fps) + 1)
+        if i0 >= i1:
+            return 0., 0.
+        return float(self.left[i0:i1].mean()), float(self.right[i0:i1].mean())
+
+    def classify(self, time_sec, window=WINDOW, threshold=THRESHOLD):
+        """
+        ('left' | 'right' | 'neither', confidence from 0 to 1, left energy, right energy)
+        at time_sec seconds in the video
+        """
+        left, right = self.energy(time_sec, window)
+        strongest = max(left, right)
+        if strongest == 0:  # also with threshold 0
+            return 'neither', 1., left, right
+        if strongest < threshold:
+            return 'neither', 1 - strongest / threshold, left, right
+        return ('left' if left >= right else 'right'), abs(left - right) / (left + right), left, right
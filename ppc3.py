@@ -57,51 +57,93 @@ def deg2cm(angle, distance):
 
 
 class csvWriter(object):
-    def __init__(self, saveFilePrefix='', saveFolder='', headerTrial=False):
+    def __init__(self, saveFilePrefix='', saveFolder='', headerTrial=False, flushInterval=0.5, fsync=True):
         """
         Creates a csv file and appends single rows to it using the csvWriter.write() function.
-        Use this function to save trials. Writing is very fast. Around a microsecond.
+        Use this function to save trials. Writing is very fast. Around a microsecond: write() only
+        appends the row to a memory buffer, and a background thread writes the buffer to disk every
+        flushInterval seconds. A crash therefore loses at most the last interval. The file is
+        flushed and closed by close(), which also runs automatically at exit.
 
         :saveFilePrefix: a string to prefix the file with
         :saveFolder: (string/False) if False, uses same directory as the py file
-        :headerTrial: (dict/False) writes dict.keys() as header row in csv.
+        :headerTrial: (dict/list/False) the columns of the csv, as dict.keys() or a list of names.
+            Written as header row right away. If False, the keys of the first trial are used.
+        :flushInterval: seconds between writes to disk
+        :fsync: (True/False) also make the OS put the file on disk at every flush
         """
-        import csv, time
+        import atexit, collections, csv, os, threading, time
 
         # Create folder if it doesn't exist
         if saveFolder:
-            import os
             saveFolder += '/'
             if not os.path.isdir(saveFolder):
                 os.makedirs(saveFolder)
 
         # Generate self.saveFile and self.writer
         self.saveFile = saveFolder + str(saveFilePrefix) + ' (' + time.strftime('%Y-%m-%d %H-%M-%S', time.localtime()) +').csv'  # Filename for csv. E.g. "myFolder/subj1_cond2 (2013-12-28 09-53-04).csv"
-        self.writer = csv.writer(open(self.saveFile, 'w'), delimiter=';').writerow  # The writer function to csv. Appends a single row to file
-        #self.writer = csv.writer(open(self.saveFile, 'wb'), delimiter=';').writerow  # The writer function to csv. Appends a single row to file
-        
-        self.headerWritten = False
+        self.file = open(self.saveFile, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file, delimiter=';').writerow  # The writer function to csv. Appends a single row to file
+
+        self.flushInterval = flushInterval
+        self.fsync = fsync
+        self.buffer = collections.deque()  # rows waiting for the background thread. append/popleft are thread safe
+        self.lock = threading.Lock()  # one flush at a time
+        self.wake = threading.Event()
+        self.closed = False
+
+        self.fields = None
+        if headerTrial and headerTrial is not True:
+            self._setFields(headerTrial)
+
+        self.thread = threading.Thread(target=self._run, name='csvWriter')
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _setFields(self, fields):
+        self.fields = list(fields)
+        self.fieldSet = set(self.fields)
+        self.buffer.append(self.fields)
 
     def write(self, trial):
-        """:trial: a dictionary"""
-        if not self.headerWritten:
-            self.headerWritten = True
-            self.writer(trial.keys())
-        self.writer(trial.values())
-        
-        
-        
-        #if headerTrial:
-        #    self.writer(list(headerTrial.keys()))
-
-#    def write(self, trial):
-#        """:trial: a dictionary"""
-#        self.writer(list(trial.values()))
-#    
-#    """ A function added by MW in order to be able to write headers to the logfile"""
-#    def writeheader(self,trial):
-#        """:trial: a dictionary"""
-#        self.writer(list(trial.keys()))
+        """:trial: a dictionary. Keys missing from the header are written as nan."""
+        if self.closed:
+            raise ValueError('write to closed csvWriter: ' + self.saveFile)
+        if self.fields is None:
+            self._setFields(trial.keys())
+        elif not self.fieldSet.issuperset(trial):
+            raise ValueError('trial has keys that are not columns of ' + self.saveFile + ': ' +
+                             ', '.join(sorted(set(trial) - self.fieldSet)))
+        self.buffer.append([trial.get(key, 'nan') for key in self.fields])
+
+    def flush(self):
+        """ writes the buffered rows to disk now """
+        import os
+        with self.lock:
+            if not self.buffer or self.file.closed:
+                return
+            while self.buffer:
+                self.writer(self.buffer.popleft())
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        """ writes the remaining rows and closes the file. Safe to call more than once. """
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+    def _run(self):
+        while not self.closed:
+            self.wake.wait(self.flushInterval)
+            self.flush()
+
         
 def getActualFrameRate(frames=1000):
     """
@@ -133,6 +175,99 @@ def getActualFrameRate(frames=1000):
     print('60 frames on your monitor takes', round(np.average(durations) * 60 * 1000, 3), 'ms')
     print('shortest duration was ', round(min(durations) * 1000, 3), 'ms and longest duration was ', round(max(durations) * 1000, 3), 'ms')
 
+class timingMonitor(object):
+    def __init__(self, framePeriod=1/60., binWidth=0.00005, maxTime=0.25):
+        """
+        Always-on timing of a running experiment, cheap enough to call every frame.
+        Durations go into fixed-width histograms, one per name, so memory does not grow
+        with the length of the session. Usage::
+            monitor = timingMonitor(win.monitorFramePeriod)
+            win.flip()
+            monitor.flipped()                    # flip-to-flip interval, 'frame'
+            t0 = monitor.clock()
+            doSomething()
+            monitor.add('doSomething', monitor.clock() - t0)
+            monitor.save('timing.json')
+
+        :framePeriod: expected seconds per frame. Frames longer than 1.5 periods count as dropped.
+        :binWidth: histogram resolution in seconds
+        :maxTime: durations above this go into the last bin (their exact maximum is kept)
+        """
+        import time
+        self.clock = time.perf_counter
+        self.framePeriod = framePeriod
+        self.binWidth = binWidth
+        self.bins = int(maxTime / binWidth) + 1
+        self.histograms = {}
+        self.totals = {}
+        self.maxima = {}
+        self.dropped = 0
+        self.lastFlip = None
+
+    def add(self, name, duration):
+        """ records a duration in seconds under name """
+        counts = self.histograms.get(name)
+        if counts is None:
+            counts = self.histograms[name] = [0] * self.bins
+            self.totals[name] = 0.
+            self.maxima[name] = 0.
+        counts[min(int(duration / self.binWidth), self.bins - 1)] += 1
+        self.totals[name] += duration
+        if duration > self.maxima[name]:
+            self.maxima[name] = duration
+
+    def flipped(self):
+        """ call right after win.flip(). Records the interval since the previous flip as 'frame'. """
+        now = self.clock()
+        if self.lastFlip is not None:
+            interval = now - self.lastFlip
+            self.add('frame', interval)
+            if interval > 1.5 * self.framePeriod:
+                self.dropped += 1
+        self.lastFlip = now
+        return now
+
+    def restart(self):
+        """ forget the last flip, e.g. after waiting for a key, so the pause is not counted as a frame """
+        self.lastFlip = None
+
+    def summary(self, name):
+        """ n, mean, percentiles and maximum of name, in ms """
+        import numpy as np
+        counts = np.array(self.histograms[name])
+        n = int(counts.sum())
+        cumulative = np.cumsum(counts)
+        def percentile(p):  # upper edge of the bin holding the p-th percentile
+            edge = (np.searchsorted(cumulative, p / 100. * n) + 1) * self.binWidth
+            return round(min(float(edge), self.maxima[name]) * 1000, 3)
+        return {'n': n,
+                'mean_ms': round(self.totals[name] / n * 1000, 3),
+                'p50_ms': percentile(50), 'p95_ms': percentile(95), 'p99_ms': percentile(99),
+                'max_ms': round(self.maxima[name] * 1000, 3)}
+
+    def report(self, maxDropped=0.01):
+        """
+        Summary of everything recorded. A session counts as reliable if at most
+        maxDropped of its frames were dropped and 99% of frames took less than
+        two frame periods; otherwise its timestamps may be off by whole frames.
+        """
+        report = {'frame_period_ms': round(self.framePeriod * 1000, 3),
+                  'timings': {name: self.summary(name) for name in sorted(self.histograms)}}
+        frames = report['timings'].get('frame')
+        if frames:
+            report['dropped_frames'] = self.dropped
+            report['dropped_fraction'] = round(self.dropped / float(frames['n']), 5)
+            report['reliable'] = (report['dropped_fraction'] <= maxDropped and
+                                  frames['p99_ms'] < 2000 * self.framePeriod)
+        return report
+
+    def save(self, filename, **kwargs):
+        """ writes report(**kwargs) as json """
+        import json
+        with open(filename, 'w') as f:
+            json.dump(self.report(**kwargs), f, indent=2)
+
+
 def dkl2rgb(dkl):
     """ takes a DKL color as input and returns the corresponding RGB color """
     from numpy import array
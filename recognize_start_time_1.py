@@ -1,54 +1,238 @@
+import argparse
+import subprocess
+
 import cv2
 import easyocr
+import numpy as np
+
+import cut_info
 
 # Initialize EasyOCR reader (English)
 reader = easyocr.Reader(['en'])
 
+# The welcome screen is white text on black and, unlike the game screens, has no
+# coloured blocks (msg() in CreativeForaging.py). These limits are checked on
+# every PREFILTER_STRIDE-th pixel of the screen region before a frame is given to OCR.
+# SCREEN_ROI is where the game screen is in the recording, as fractions
+# (left, top, right, bottom) of the frame; the camera sees more than the screen.
+SCREEN_ROI = (0.0, 0.0, 1.0, 1.0)
+PREFILTER_STRIDE = 8
+# coarse samples the pre-filter may reject, none passing, before it is taken
+# to not fit the recording and the search restarts with OCR on every sample
+PREFILTER_PATIENCE = 30
+MIN_DARK = 0.85  # fraction of near black pixels
+MIN_TEXT, MAX_TEXT = 0.0005, 0.10  # fraction of near white pixels
+MAX_COLOURED = 0.002  # fraction of saturated pixels, i.e. blocks
+OCR_MAX_WIDTH = 1280  # larger text regions are downscaled to this width
+
+FFMPEG = "ffmpeg"
+MAX_OFFSET = 30.0  # seconds a stream copy may start before the welcome screen, i.e. the longest keyframe interval
+
+stats = {"checked": 0, "ocr": 0}
+
+
 def recognize_text_from_frame(frame):
     results = reader.readtext(frame)
     plain_text = " ".join([text for (_, text, _) in results])
     return plain_text.lower()
 
-video_path = "game.mp4"
-cap = cv2.VideoCapture(video_path)
 
-if not cap.isOpened():
-    raise IOError("Error opening video file")
+def screen_box(frame, roi=SCREEN_ROI):
+    """(x0, y0, x1, y1) pixel box of roi in the frame"""
+    h, w = frame.shape[:2]
+    left, top, right, bottom = roi
+    return int(left * w), int(top * h), max(int(left * w) + 1, int(round(right * w))), \
+        max(int(top * h) + 1, int(round(bottom * h)))
+
+
+def text_region(frame, roi=SCREEN_ROI):
+    """
+    (x0, y0, x1, y1) around the white pixels if the screen region of the BGR frame
+    looks like a text screen, otherwise None. Only looks at every PREFILTER_STRIDE-th
+    pixel, so it is far cheaper than OCR.
+    """
+    x0, y0, x1, y1 = screen_box(frame, roi)
+    screen = frame[y0:y1, x0:x1]
+    h, w = screen.shape[:2]
+    sample = cv2.resize(screen, (max(1, w // PREFILTER_STRIDE), max(1, h // PREFILTER_STRIDE)),
+                        interpolation=cv2.INTER_NEAREST)
+    b, g, r = cv2.split(sample)
+    lo, hi = cv2.min(cv2.min(b, g), r), cv2.max(cv2.max(b, g), r)
+    n = lo.size
+    white = lo > 180
+    n_white = white.sum()
+    if (hi < 60).sum() < MIN_DARK * n or not MIN_TEXT * n <= n_white <= MAX_TEXT * n:
+        return None
+    if (hi - lo > 60).sum() > MAX_COLOURED * n:
+        return None
+
+    ys, xs = white.nonzero()
+    margin = 2 * PREFILTER_STRIDE
+    return (x0 + max(0, int(xs.min()) * PREFILTER_STRIDE - margin),
+            y0 + max(0, int(ys.min()) * PREFILTER_STRIDE - margin),
+            x0 + min(w, (int(xs.max()) + 1) * PREFILTER_STRIDE + margin),
+            y0 + min(h, (int(ys.max()) + 1) * PREFILTER_STRIDE + margin))
+
+
+def crop_for_ocr(frame, box):
+    """The text region of the BGR frame as RGB, at most OCR_MAX_WIDTH wide"""
+    x0, y0, x1, y1 = box
+    crop = frame[y0:y1, x0:x1]
+    if crop.shape[1] > OCR_MAX_WIDTH:
+        scale = OCR_MAX_WIDTH / crop.shape[1]
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
 
-fps = cap.get(cv2.CAP_PROP_FPS)
-frame_interval = int(fps * 0.5)  # every 0.5 seconds
-frame_number = 0
-first_frame_with_text = None
 
-while cap.isOpened():
+def is_start_screen(frame, roi=SCREEN_ROI, prefilter=True):
+    """
+    True if the BGR frame shows the welcome screen of the game. Without prefilter,
+    every frame goes to OCR, cropped to the screen region.
+    """
+    stats["checked"] += 1
+    box = text_region(frame, roi) if prefilter else screen_box(frame, roi)
+    if box is None:
+        return False
+    stats["ocr"] += 1
+    return "welcome" in recognize_text_from_frame(crop_for_ocr(frame, box))
+
+
+def find_start_frame(video_path, coarse_sec=2.0, fine_sec=0.25, is_match=is_start_screen):
+    """
+    Returns (first frame number showing the welcome screen or None, fps).
+
+    The welcome screen stays up until the experimenter starts the practice round,
+    so the search narrows down in three steps without seeking per sample:
+    1) decode sequentially with grab() and only convert and check every coarse_sec,
+    2) seek once to just after the last miss and check every fine_sec up to the hit,
+       keeping the frames in between,
+    3) binary search those kept frames for the exact first frame.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError("Error opening video file")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    coarse = max(1, int(round(fps * coarse_sec)))
+    fine = max(1, min(coarse, int(round(fps * fine_sec))))
+
+    # 1) coarse pass
+    last_miss, hit = -1, None
+    frame_number = 0
+    while cap.grab():
+        if frame_number % coarse == 0:
+            ok, frame = cap.retrieve()
+            if ok and is_match(frame):
+                hit = frame_number
+                break
+            last_miss = frame_number
+        frame_number += 1
+    cap.release()
+
+    if hit is None or hit - last_miss == 1:
+        return hit, fps
+
+    # 2) fine pass between the last miss and the hit
+    cap = cv2.VideoCapture(video_path)
+    frame_number = last_miss + 1
     cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-    ret, frame = cap.read()
-    if not ret:
-        break
+    pending = []  # frames since the last miss
+    while frame_number <= hit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        pending.append((frame_number, frame))
+        if (frame_number - last_miss) % fine == 0 or frame_number == hit:
+            if frame_number == hit or is_match(frame):
+                # 3) exact frame: pending[-1] matches, everything before the list did not
+                lo, hi = 0, len(pending) - 1
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if is_match(pending[mid][1]):
+                        hi = mid
+                    else:
+                        lo = mid + 1
+                cap.release()
+                return pending[lo][0], fps
+            last_miss = frame_number
+            pending = []
+        frame_number += 1
+    cap.release()
+    return hit, fps  # could not decode up to the coarse hit; keep it
+
+
+class _PrefilterMisfit(Exception):
+    pass
+
+
+def detect_start(video_path, coarse_sec=2.0, fine_sec=0.25, roi=SCREEN_ROI, patience=PREFILTER_PATIENCE):
+    """
+    find_start_frame() with the pre-filter. If the pre-filter rejects the first
+    patience samples without passing any to OCR, e.g. because roi does not fit
+    the recording, searches again from the start with OCR on every sample.
+    """
+    start = stats["ocr"]
+    rejected = [0]
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    text = recognize_text_from_frame(frame_rgb)
+    def prefiltered(frame):
+        if is_start_screen(frame, roi):
+            return True
+        if stats["ocr"] == start:
+            rejected[0] += 1
+            if rejected[0] >= patience:
+                raise _PrefilterMisfit()
+        return False
 
-    if "welcome" in text:
-        first_frame_with_text = frame_number
-        print(f"'welcome' found at frame {frame_number}, time {frame_number/fps:.2f} seconds")
-        break
+    try:
+        result = find_start_frame(video_path, coarse_sec, fine_sec, prefiltered)
+    except _PrefilterMisfit:
+        result = None, None
+    if result[0] is None and stats["ocr"] == start:
+        print(f"The pre-filter rejected the first {rejected[0]} samples; running OCR on every sample")
+        result = find_start_frame(video_path, coarse_sec, fine_sec,
+                                  lambda frame: is_start_screen(frame, roi, prefilter=False))
+    return result
 
-    frame_number += frame_interval
 
-cap.release()
+def cut_video_copy(video_path, start_frame, fps, output_path="cut_video.mp4"):
+    """
+    Cut video from the keyframe before start_frame to end by stream copy, audio
+    included, without decoding or re-encoding it. Returns the offset of start_frame
+    in the cut video in seconds.
+    """
+    subprocess.run([FFMPEG, "-y", "-loglevel", "error", "-ss", f"{start_frame / fps:.6f}", "-i", video_path,
+                    "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero", output_path], check=True)
 
-if first_frame_with_text is None:
-    print("Text not found in video")
-else:
-    # Cut video from this frame to end
+    # the copied frames decode exactly as in the original, so look for the start frame
     cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame_with_text)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    ok, start = cap.read()
+    cap.release()
+    if not ok:
+        raise ValueError(f"Could not read frame {start_frame} of {video_path}")
+
+    cap = cv2.VideoCapture(output_path)
+    for k in range(int(MAX_OFFSET * fps) + 1):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if np.array_equal(frame, start):
+            cap.release()
+            return k / fps
+    cap.release()
+    raise ValueError(f"Frame {start_frame} not found in the first {MAX_OFFSET:.0f} s of {output_path}; "
+                     f"try --cut reencode")
+
+
+def cut_video_reencode(video_path, start_frame, fps, output_path="cut_video.mp4"):
+    """Cut video from start_frame to end, re-encoding every frame without audio. Returns the offset 0."""
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
 
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter("cut_video.mp4", fourcc, fps, (width, height))
+    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
     while True:
         ret, frame = cap.read()
@@ -58,4 +242,41 @@ else:
 
     cap.release()
     out.release()
-    print("Video saved as cut_video.mp4")
+    return 0.0
+
+
+def cut_video(video_path, start_frame, fps, output_path="cut_video.mp4", mode="copy"):
+    """Cut video so it starts at start_frame (or just before it) and save the offset next to it, see cut_info."""
+    cut = cut_video_copy if mode == "copy" else cut_video_reencode
+    offset = cut(video_path, start_frame, fps, output_path)
+    cut_info.save(output_path, source=video_path, mode=mode, fps=fps, start_frame=start_frame,
+                  start_time=start_frame / fps, offset=offset)
+    print(f"Video saved as {output_path}, welcome screen at {offset:.3f} seconds")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Find the welcome screen in the game recording and cut the video there.")
+    ap.add_argument("--video", default="game.mp4", help="Recording of the session (default: game.mp4).")
+    ap.add_argument("--output", default="cut_video.mp4", help="Cut video (default: cut_video.mp4).")
+    ap.add_argument("--coarse", type=float, default=2.0,
+                    help="Seconds between checks in the first pass; must be shorter than the welcome screen is shown.")
+    ap.add_argument("--fine", type=float, default=0.25, help="Seconds between checks in the second pass.")
+    ap.add_argument("--cut", choices=("copy", "reencode"), default="copy",
+                    help="copy: fast stream copy from the keyframe before the welcome screen, keeps audio (default); "
+                         "reencode: start exactly at the welcome screen.")
+    ap.add_argument("--screen-roi", type=float, nargs=4, default=SCREEN_ROI, metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                    help="Region of the game screen in the recording, as fractions of the frame (default: all).")
+    args = ap.parse_args()
+
+    first_frame_with_text, fps = detect_start(args.video, args.coarse, args.fine, args.screen_roi)
+    print(f"Ran OCR on {stats['ocr']} of {stats['checked']} checked frames")
+
+    if first_frame_with_text is None:
+        print("Text not found in video")
+    else:
+        print(f"'welcome' found at frame {first_frame_with_text}, time {first_frame_with_text/fps:.2f} seconds")
+        cut_video(args.video, first_frame_with_text, fps, args.output, args.cut)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Random access to the board of a recorded session.
+
+Replay sorts the move and gallery events of one phase by time once. A query
+for time t bisects into that index, starts from the nearest checkpoint
+(a full copy of the board every checkpoint_every events) and applies the
+few moves in between, so each query costs O(log n + checkpoint_every)
+however long the session is. Usage::
+    replay = Replay.from_csv('logsByGame.csv', phase='practice')
+    replay.positions_at(42.0)           # board at 42 s, as screen positions
+    replay.window(40.0, 50.0)           # every board between 40 and 50 s
+    replay.diff(40.0, 50.0)             # {block: (cell at 40 s, cell at 50 s)}
+
+Boards are (10, 2) int8 lattice cells as in board.py and binlog.py. Moves
+take effect at their end_time, when the block is dropped.
+"""
+import bisect
+
+import numpy as np
+
+from board import START, to_lattice, to_screen
+import binlog
+import logfiles
+
+
+class Replay(object):
+    def __init__(self, times, units, targets, start=START, kinds=None, checkpoint_every=32):
+        """
+        :times: event times, in any order
+        :units: moved block of every event, -1 for events that do not move a block
+        :targets: (col, row) the block was dropped on, ignored when unit is -1
+        :start: screen positions of the board before the first event
+        :kinds: optional event type of every event, e.g. logfiles.MOVE
+        :checkpoint_every: events between stored copies of the board
+        """
+        order = np.argsort(np.asarray(times, dtype=float), kind='stable')
+        self.times = np.asarray(times, dtype=float)[order]
+        self.units = np.asarray(units, dtype=np.int8).reshape(-1)[order]
+        self.targets = np.asarray(targets, dtype=np.int8).reshape(-1, 2)[order]
+        self.kinds = None if kinds is None else [kinds[i] for i in order]
+        self.time_list = self.times.tolist()  # bisect is faster on a list
+        self.checkpoint_every = checkpoint_every
+
+        state = np.array([to_lattice(p) for p in start], dtype=np.int8)
+        self.start = state.copy()
+        self.checkpoints = [state.copy()]
+        for i in range(len(self.times)):
+            if self.units[i] >= 0:
+                state[self.units[i]] = self.targets[i]
+            if (i + 1) % checkpoint_every == 0:
+                self.checkpoints.append(state.copy())
+        self.last = (0, self.start.copy())  # most recent query, to continue from when playing forward
+
+    @classmethod
+    def from_rows(cls, rows, phase=None, **kwargs):
+        """
+        :rows: rows of logfiles.read_log()
+        :phase: 'practice' or 'experiment'. The clock restarts between phases, so
+            it is required when the log has both.
+        """
+        phases = sorted({row['phase'] for row in rows})
+        if phase is None:
+            if len(phases) > 1:
+                raise ValueError('log has phases {}; choose one'.format(', '.join(phases)))
+        else:
+            rows = [row for row in rows if row['phase'] == phase]
+
+        times, units, targets, kinds = [], [], [], []
+        start = None
+        for row in rows:
+            if row['type'] == logfiles.MOVE and row['end_position'] and row['end_time'] is not None:
+                if start is None and row['all_positions']:
+                    start = row['all_positions']
+                times.append(row['end_time'])
+                units.append(row['unit'])
+                targets.append(to_lattice(row['end_position']))
+            elif row['type'] == logfiles.GALLERY and row['start_time'] is not None:
+                times.append(row['start_time'])
+                units.append(-1)
+                targets.append((0, 0))
+            else:
+                continue
+            kinds.append(row['type'])
+        return cls(times, units, targets, start=start or START, kinds=kinds, **kwargs)
+
+    @classmethod
+    def from_csv(cls, filename, phase=None, **kwargs):
+        return cls.from_rows(logfiles.read_log(filename), phase=phase, **kwargs)
+
+    @classmethod
+    def from_binlog(cls, filename, phase=None, **kwargs):
+        """ from a .cflog file; phase is required when it has both """
+        records = binlog.read(filename).records
+        phases = sorted(set(records['phase'].tolist()))
+        if phase is None:
+            if len(phases) > 1:
+                raise ValueError('log has both phases; choose one')
+        else:
+            records = records[records['phase'] == binlog.PHASES.index(phase)]
+        moves = records['kind'] == binlog.MOVE
+        units = np.where(moves, records['unit'], -1)
+        times = np.where(moves, records['end_time'], records['start_time'])
+        targets = records['cells'][np.arange(len(records)), np.maximum(units, 0)]
+        kinds = [binlog.KINDS[k] for k in records['kind'].tolist()]
+        # every phase starts from the START row
+        return cls(times, units, targets, kinds=kinds, **kwargs)
+
+    def __len__(self):
+        return len(self.times)
+
+    def index(self, t):
+        """ number of events up to and including time t """
+        return bisect.bisect_right(self.time_list, t)
+
+    def _state(self, n):
+        """ the board after the first n events """
+        last_n, last_state = self.last
+        c = n // self.checkpoint_every
+        if last_n <= n and last_n >= c * self.checkpoint_every:
+            state, i = last_state.copy(), last_n
+        else:
+            state, i = self.checkpoints[c].copy(), c * self.checkpoint_every
+        for j in range(i, n):
+            if self.units[j] >= 0:
+                state[self.units[j]] = self.targets[j]
+        self.last = (n, state.copy())
+        return state
+
+    def state_at(self, t):
+        """ (10, 2) int8 lattice cells of the board at time t """
+        return self._state(self.index(t))
+
+    def positions_at(self, t):
+        """ screen positions of the board at time t, like the 'all_positions' column """
+        return [to_screen(c) for c in self.state_at(t).tolist()]
+
+    def window(self, a, b):
+        """
+        Every board between times a and b.
+
+        :returns: times, (M + 1,) a followed by the times of the M events in (a, b],
+                  and states, (M + 1, 10, 2) the board at a and after each of those events
+        """
+        first, last = self.index(a), self.index(b)
+        state = self._state(first)
+        states = [state.copy()]
+        for j in range(first, last):
+            if self.units[j] >= 0:
+                state[self.units[j]] = self.targets[j]
+            states.append(state.copy())
+        self.last = (last, state.copy())
+        return np.concatenate([[a], self.times[first:last]]), np.array(states)
+
+    def diff(self, t1, t2):
+        """ {block: (cell at t1, cell at t2)} for the blocks that are elsewhere at t2 """
+        before, after = self.state_at(t1), self.state_at(t2)
+        moved = np.flatnonzero((before != after).any(axis=1))
+        return {int(i): (tuple(before[i].tolist()), tuple(after[i].tolist())) for i in moved}
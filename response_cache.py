@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of frame classifications.
+
+A response is stored under the hash of the image bytes that were sent, the
+prompt and the model, so a rerun with the same frames, prompt and model
+makes no remote calls, and changing any of them misses the cache. Entries
+older than max_age_days and, beyond max_entries, the least recently used
+ones are dropped when the cache is saved. Usage::
+    cache = ResponseCache('.response_cache.json')
+    key = ResponseCache.key(image_bytes, PROMPT, MODEL)
+    hit = cache.get(key)                # (explanation, answer) or None
+    cache.put(key, explanation, answer, MODEL)
+    cache.save()
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_FILE = '.response_cache.json'
+DAY = 24 * 60 * 60
+
+
+class ResponseCache(object):
+    def __init__(self, filename=CACHE_FILE, max_entries=100000, max_age_days=180):
+        """
+        :filename: json file to load from and save to. Starts empty if it does not exist.
+        :max_age_days: None to keep entries regardless of age
+        """
+        self.filename = filename
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.responses = {}
+        self.lock = threading.Lock()  # get() and put() are called from worker threads
+        if os.path.isfile(filename):
+            with open(filename, encoding='utf-8') as f:
+                self.responses = json.load(f)['responses']
+
+    def __len__(self):
+        return len(self.responses)
+
+    @staticmethod
+    def key(image, prompt, model):
+        """ sha256 hex digest of the image bytes, the prompt and the model name """
+        h = hashlib.sha256()
+        for part in (image, prompt.encode('utf-8'), model.encode('utf-8')):
+            h.update(len(part).to_bytes(8, 'little'))
+            h.update(part)
+        return h.hexdigest()
+
+    def get(self, key):
+        """ (explanation, answer) as analyze_frame() returns them, or None if the key is not cached """
+        with self.lock:
+            entry = self.responses.get(key)
+            if entry is None:
+                return None
+            entry['used'] = time.time()
+            return entry['explanation'], entry['answer']
+
+    def put(self, key, explanation, answer, model):
+        now = time.time()
+        with self.lock:
+            self.responses[key] = {'answer': answer, 'explanation': explanation, 'model': model,
+                                   'created': now, 'used': now}
+
+    def evict(self, now=None):
+        """ drops expired entries and the least recently used ones beyond max_entries. Returns how many. """
+        now = time.time() if now is None else now
+        with self.lock:
+            before = len(self.responses)
+            if self.max_age_days is not None:
+                oldest = now - self.max_age_days * DAY
+                self.responses = {k: e for k, e in self.responses.items() if e['created'] >= oldest}
+            if len(self.responses) > self.max_entries:
+                keep = sorted(self.responses, key=lambda k: self.responses[k]['used'], reverse=True)
+                self.responses = {k: self.responses[k] for k in keep[:self.max_entries]}
+            return before - len(self.responses)
+
+    def save(self, filename=None):
+        """ evicts and writes the cache, replacing the file in one step """
+        filename = filename or self.filename
+        self.evict()
+        tmp = filename + '.tmp'
+        with self.lock, open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'responses': self.responses}, f, indent=1, sort_keys=True)
+        os.replace(tmp, filename)
@@ -5,14 +5,15 @@
 Creative Foraging – Analysis Pipeline Runner (without game execution)
 
 Flow (run these in order, game is run separately):
-2) recognize_start_time_1.py   -> reads: game.mp4 ; writes: cut_video.mp4
+2) recognize_start_time_1.py   -> reads: game.mp4 ; writes: cut_video.mp4 + cut_video.json (offset, see cut_info.py)
 3) middle_turns_frames_2.py    -> reads: logsByGame.csv + cut_video.mp4 ; writes: frames/
    (also supports the mis-typed name: middle_truns_frames_2.py)
 4) create_logs_table_3.py      -> reads: frames/ + logsByGame.csv ; writes: logs.csv
 5) create_video_with_subs_4.py -> reads: cut_video.mp4 + logs.csv ; writes: ./output/video_with_subs.mp4
 
 Notes:
-- Step 4 likely requires an OpenAI API key (export OPENAI_API_KEY=...).
+- Step 4 likely requires an OpenAI API key (export OPENAI_API_KEY=...);
+  --backend motion runs it offline with the motion detector instead.
 - Step 5 prompts for two player names; this runner can auto-feed them.
 """
 
@@ -75,6 +76,10 @@ def main():
                     help="Do NOT auto-feed names to step 5 (let it prompt interactively).")
     ap.add_argument("--env-api-key", default="api_key",
                     help="Env var name that holds the OpenAI API key for step 4 (default: api_key).")
+    ap.add_argument("--backend", default="openai",
+                    help="Classifier for step 4: openai (default) or motion (offline, no API key needed).")
+    ap.add_argument("--processes", type=int, default=1,
+                    help="Worker processes for frame extraction in step 3, 0 for all cores (default: 1).")
 
     args = ap.parse_args()
     wd = Path(args.workdir).resolve()
@@ -107,12 +112,12 @@ def main():
     check_exists(cut_video)
 
     # === Step 3: middle_*_frames_2.py -> frames/
-    run_script(frames_script)
+    run_script(frames_script, ["--processes", str(args.processes)])
     frames_dir = wd / DEFAULTS["frames_dir"]
     check_exists(frames_dir, kind="dir")
 
     # === Step 4: create_logs_table_3.py -> logs.csv
-    run_script(logs_table_script)
+    run_script(logs_table_script, ["--backend", args.backend])
     logs_csv = wd / DEFAULTS["logs_csv"]
     check_exists(logs_csv)
 
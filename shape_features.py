@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Shape descriptors for whole sessions at once.
+
+Every function takes an (N, n, 2) array of block positions, either screen
+coordinates as in the logs or lattice cells, and computes its descriptor for
+all N figures with numpy, without a loop over figures. Usage::
+    coords = shape_features.load_coords('logsByGame.csv')     # (N, 10, 2) gallery figures
+    table = shape_features.features(coords)                   # pandas DataFrame, one row per figure
+    table = shape_features.feature_table(glob.glob('logfiles/*.csv'))
+"""
+import numpy as np
+import pandas as pd
+
+from board import STEP
+import binlog
+import logfiles
+import shapes
+
+REFLECTIONS = shapes.SYMMETRIES[4:]
+ROTATIONS = shapes.SYMMETRIES[1:4]
+
+
+def to_cells(coords):
+    """ (N, n, 2) positions -> int lattice cells with the lower left corner of every figure at (0, 0) """
+    coords = np.asarray(coords)
+    if coords.dtype.kind == 'f':
+        coords = np.rint((coords - coords.min(axis=1, keepdims=True)) / STEP)
+    cells = coords.astype(int)
+    return cells - cells.min(axis=1, keepdims=True)
+
+
+def _sorted_keys(cells):
+    """ every figure as a sorted vector of cell keys; equal vectors mean equal figures """
+    cells = cells - cells.min(axis=1, keepdims=True)
+    return np.sort(cells[..., 0] * 64 + cells[..., 1], axis=1)
+
+
+def _invariant(cells, symmetries):
+    """ (N, len(symmetries)) bool: which symmetries map each figure onto itself """
+    keys = _sorted_keys(cells)
+    return np.stack([(_sorted_keys(cells.dot(s.T)) == keys).all(axis=1) for s in symmetries], axis=1)
+
+
+def bounding_box(cells):
+    """ (N,) widths and (N,) heights in blocks """
+    size = cells.max(axis=1) - cells.min(axis=1) + 1
+    return size[:, 0], size[:, 1]
+
+
+def perimeter(cells):
+    """ (N,) number of block edges on the outline """
+    d = np.abs(cells[:, :, None, :] - cells[:, None, :, :]).sum(axis=-1)
+    shared = (d == 1).sum(axis=(1, 2)) // 2
+    return 4 * cells.shape[1] - 2 * shared
+
+
+def compactness(cells):
+    """ (N,) isoperimetric ratio 4 pi area / perimeter ** 2 with blocks of area 1; higher is more compact """
+    return 4 * np.pi * cells.shape[1] / perimeter(cells).astype(float) ** 2
+
+
+def symmetry_axes(cells):
+    """ (N,) number of mirror axes (horizontal, vertical, both diagonals), 0 to 4 """
+    return _invariant(cells, REFLECTIONS).sum(axis=1)
+
+
+def rotation_order(cells):
+    """ (N,) number of quarter turns that map the figure onto itself, including none: 1, 2 or 4 """
+    return 1 + _invariant(cells, ROTATIONS).sum(axis=1)
+
+
+def moved_blocks(coords):
+    """ (N,) number of blocks at a different position than in the previous figure, 0 for the first """
+    coords = np.asarray(coords, dtype=float)
+    changed = (np.abs(np.diff(coords, axis=0)) > STEP / 2).any(axis=2).sum(axis=1)
+    return np.concatenate([[0], changed])[:len(coords)]  # empty for no figures
+
+
+def centroid_drift(coords):
+    """
+    (N,) distance the centroid moved since the previous figure and (N,) since
+    the first one, in the units of coords. Only meaningful for positions that
+    are not normalized, e.g. the 'gallery' and 'all_positions' columns.
+    """
+    centroids = np.asarray(coords, dtype=float).mean(axis=1)
+    step = np.linalg.norm(np.diff(centroids, axis=0), axis=1)
+    return np.concatenate([[0.], step])[:len(centroids)], np.linalg.norm(centroids - centroids[:1], axis=1)
+
+
+def features(coords):
+    """ all descriptors of (N, n, 2) figures in their order, as a DataFrame """
+    coords = np.asarray(coords)
+    cells = to_cells(coords)
+    width, height = bounding_box(cells)
+    drift, total_drift = centroid_drift(coords)
+    return pd.DataFrame({
+        'width': width,
+        'height': height,
+        'aspect': np.minimum(width, height) / np.maximum(width, height),
+        'perimeter': perimeter(cells),
+        'compactness': compactness(cells),
+        'symmetry_axes': symmetry_axes(cells),
+        'rotation_order': rotation_order(cells),
+        'moved_blocks': moved_blocks(coords),
+        'centroid_drift': drift,
+        'total_drift': total_drift,
+    })
+
+
+def load_coords(filename, column='gallery'):
+    """
+    (N, 10, 2) positions from a session log.
+
+    :filename: a csv log or a .cflog binary log
+    :column: 'gallery' for the gallery figures, 'all_positions' for the board after every move
+    """
+    if filename.endswith('.cflog'):
+        kind = binlog.GALLERY if column == 'gallery' else binlog.MOVE
+        return binlog.read(filename).positions(kind)
+    rows = logfiles.read_log(filename)
+    if column == 'all_positions':
+        # the board after a move: the logged board from before it with the block dropped
+        boards = []
+        for row in rows:
+            if row['type'] == logfiles.MOVE and row['all_positions'] and row['end_position']:
+                board = list(row['all_positions'])
+                board[row['unit']] = row['end_position']
+                boards.append(board)
+    else:
+        boards = [row[column] for row in rows if row['type'] == logfiles.GALLERY and row[column]]
+    return np.array(boards, dtype=float).reshape(-1, 10, 2)
+
+
+def feature_table(filenames, column='gallery'):
+    """ features() of every session log, one table with a 'session' and a 'figure' column """
+    tables = []
+    for filename in filenames:
+        table = features(load_coords(filename, column))
+        table.insert(0, 'figure', np.arange(len(table)))
+        table.insert(0, 'session', filename)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Canonical forms of gallery figures.
+
+Two figures are the same shape if one can be turned into the other by
+translation, rotation and reflection. canonical_cells() picks one fixed
+representative out of the 8 symmetric copies, and shape_hash() turns it into
+a short string that can key dicts and files. ShapeIndex keeps track of every
+shape seen across sessions.
+"""
+import json
+import os
+
+import numpy as np
+
+from board import STEP
+import logfiles
+
+# the 8 symmetries of the square as (x, y) -> (a*x + b*y, c*x + d*y)
+SYMMETRIES = np.array([
+    [[1, 0], [0, 1]], [[0, -1], [1, 0]], [[-1, 0], [0, -1]], [[0, 1], [-1, 0]],
+    [[-1, 0], [0, 1]], [[1, 0], [0, -1]], [[0, 1], [1, 0]], [[0, -1], [-1, 0]]])
+
+
+def lattice_cells(coords):
+    """ screen coordinates -> (n, 2) int array of lattice offsets from the lower left corner """
+    xy = np.asarray(coords, dtype=float)
+    return np.rint((xy - xy.min(axis=0)) / STEP).astype(int)
+
+
+def _encode(cells):
+    """ (width, height, bitmask) of cells anchored at (0, 0); row-major, bit 0 = (0, 0) """
+    w, h = cells.max(axis=0) + 1
+    mask = 0
+    for bit in (cells[:, 1] * w + cells[:, 0]).tolist():
+        mask |= 1 << bit
+    return int(w), int(h), mask
+
+
+def _canonical(cells):
+    best = None
+    for sym in SYMMETRIES:
+        moved = cells.dot(sym.T)
+        moved -= moved.min(axis=0)
+        code = _encode(moved)
+        if best is None or code < best[0]:
+            best = (code, moved)
+    return best
+
+
+def canonical_code(cells):
+    """
+    (width, height, bitmask) of the canonical form of (n, 2) integer lattice
+    cells: the smallest code of the 8 rotated and reflected copies.
+    """
+    return _canonical(np.asarray(cells, dtype=int))[0]
+
+
+def canonical_cells(coords):
+    """
+    Returns the canonical form of a figure as a sorted tuple of (x, y) lattice
+    cells, the same for every translated, rotated or reflected copy.
+
+    :coords: list of [x, y] screen positions, e.g. a 'gallery' or 'gallery_normalized' entry
+    """
+    moved = _canonical(lattice_cells(coords))[1]
+    return tuple(sorted(map(tuple, moved.tolist())))
+
+
+def format_hash(code):
+    """ (width, height, bitmask) -> '<w>x<h>:<hex bitmask>' """
+    return '{}x{}:{:x}'.format(*code)
+
+
+def shape_hash(coords):
+    """
+    Short, collision free key of the shape of a figure: '<w>x<h>:<hex bitmask>' of
+    the canonical form, e.g. '2x5:3ff' for a 2 x 5 rectangle.
+    """
+    return format_hash(_canonical(lattice_cells(coords))[0])
+
+
+class ShapeIndex(object):
+    def __init__(self, filename=None):
+        """
+        Persistent table of shapes, keyed by shape_hash(). Every shape gets a
+        stable integer id in order of first appearance. Usage::
+            index = ShapeIndex('shapes.json')
+            index.add_log('logfiles/999 (2025-07-27 18-11-58).csv')
+            index.save()
+
+        :filename: json file to load from and save to. Starts empty if it does not exist.
+        """
+        self.filename = filename
+        self.shapes = {}
+        if filename and os.path.isfile(filename):
+            with open(filename, encoding='utf-8') as f:
+                self.shapes = json.load(f)['shapes']
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __contains__(self, key):
+        return key in self.shapes
+
+    def lookup(self, coords):
+        """ the entry of the shape of coords, or None if it has not been seen """
+        return self.shapes.get(shape_hash(coords))
+
+    def add(self, coords, session):
+        """
+        Counts one occurrence of the shape of coords in session. Returns its id.
+        Sessions are counted once each as long as they are added one after another.
+        """
+        key = shape_hash(coords)
+        entry = self.shapes.get(key)
+        if entry is None:
+            entry = self.shapes[key] = {
+                'id': len(self.shapes),
+                'first_session': session,
+                'last_session': session,
+                'count': 0,
+                'sessions': 1}
+        elif entry['last_session'] != session:
+            entry['last_session'] = session
+            entry['sessions'] += 1
+        entry['count'] += 1
+        return entry['id']
+
+    def add_log(self, filename, session=None):
+        """
+        Adds every gallery figure of a session log. Returns their ids in order.
+
+        :session: name of the session, defaults to '<id>_<date>' of the log
+        """
+        rows = logfiles.read_log(filename)
+        session = session or logfiles.session_id(rows, default=filename)
+        return [self.add(row['gallery'], session)
+                for row in rows if row['type'] == logfiles.GALLERY and row['gallery']]
+
+    def save(self, filename=None):
+        """ writes the index, replacing the file in one step """
+        filename = filename or self.filename
+        tmp = filename + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'shapes': self.shapes}, f, indent=1, sort_keys=True)
+        os.replace(tmp, filename)
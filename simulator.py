@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch simulator for the Creative Foraging game.
+
+Plays games with the rules of board.py without psychopy: random games are
+advanced in lockstep as numpy arrays, one batch per worker process, and
+scripted games are replayed through Board. The results are lattice cells as
+in binlog.py, so synthetic sessions can go through the same analysis as
+recorded ones. Usage::
+    python simulator.py --games 10000 --moves 60 --out baseline.npz
+"""
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from board import Board, COLS, ROWS, START, to_lattice
+
+FULL = (1 << COLS) - 1
+BITS = np.arange(COLS, dtype=np.uint32)
+
+
+def _dilate(a):
+    """
+    cells sharing an edge with a set cell of a (..., ROWS) bitboard, one uint32
+    per row with bit col set for an occupied cell; a itself not included
+    """
+    out = ((a << 1) | (a >> 1)) & FULL
+    out[..., 1:] |= a[..., :-1]
+    out[..., :-1] |= a[..., 1:]
+    return out
+
+
+def _bitboards(cells):
+    """ (G, n, 2) cells -> (G, n, ROWS) uint32 bitboards, one per block """
+    g, n = cells.shape[:2]
+    boards = np.zeros((g, n, ROWS), dtype=np.uint32)
+    # shift in uint32: with the int8 cells of random_games() the shift itself would be int8
+    bits = np.left_shift(np.uint32(1), cells[..., 0].astype(np.uint32))
+    boards[np.arange(g)[:, None], np.arange(n)[None, :], cells[..., 1]] = bits
+    return boards
+
+
+def movable(cells):
+    """
+    (G, n) bool: which blocks of each game can be lifted without splitting the
+    figure, the batch version of Board.removable() for connected figures.
+    """
+    blocks = _bitboards(cells)
+    rest = np.bitwise_or.reduce(blocks, axis=1)[:, None] & ~blocks
+    # grow from another block of the figure until nothing changes
+    n = cells.shape[1]
+    other = np.where(np.arange(n) == 0, 1, 0)
+    reach = blocks[:, other]
+    while True:
+        grown = (reach | _dilate(reach)) & rest
+        if (grown == reach).all():
+            break
+        reach = grown
+    return (reach == rest).all(axis=2)
+
+
+def random_step(cells, rng):
+    """
+    Moves one random movable block of every game to a random allowed cell, in place.
+
+    :cells: (G, n, 2) int array of (col, row) cells
+    :rng: numpy Generator
+    :returns: (G,) int array with the moved block of each game
+    """
+    g = len(cells)
+    games = np.arange(g)
+    keys = rng.random((g, cells.shape[1]))
+    keys[~movable(cells)] = -1
+    unit = keys.argmax(axis=1)
+
+    blocks = _bitboards(cells)
+    occupied = np.bitwise_or.reduce(blocks, axis=1)
+    others = occupied & ~blocks[games, unit]
+    # like the game, the old cell of the block is still occupied when it is dropped
+    allowed = _dilate(others) & ~occupied
+    allowed = (allowed[..., None] >> BITS) & 1 == 1
+
+    keys = rng.random((g, ROWS, COLS))
+    keys[~allowed] = -1
+    row, col = np.unravel_index(keys.reshape(g, -1).argmax(axis=1), (ROWS, COLS))
+    cells[games, unit, 0] = col
+    cells[games, unit, 1] = row
+    return unit
+
+
+def random_games(n_games, n_moves, seed=None, start=START):
+    """
+    Plays n_games games of n_moves uniformly random moves (a random movable
+    block to a random allowed cell) in lockstep.
+
+    :returns: cells, (n_games, n_moves + 1, n, 2) int8 board after every move
+              starting with the start position, and units, (n_games, n_moves)
+              int8 moved block of every move
+    """
+    rng = np.random.default_rng(seed)
+    cells = np.tile(np.array([to_lattice(p) for p in start]), (n_games, 1, 1))
+    history = np.zeros((n_games, n_moves + 1) + cells.shape[1:], dtype=np.int8)
+    units = np.zeros((n_games, n_moves), dtype=np.int8)
+    history[:, 0] = cells
+    for t in range(n_moves):
+        units[:, t] = random_step(cells, rng)
+        history[:, t + 1] = cells
+    return history, units
+
+
+def _batch(args):
+    return random_games(*args)
+
+
+def simulate(n_games, n_moves, seed=0, processes=None, batch_size=512):
+    """
+    random_games() split into batches over a process pool. The result only
+    depends on seed and batch_size, not on the number of processes.
+    """
+    sizes = [min(batch_size, n_games - i) for i in range(0, n_games, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(size, n_moves, s) for size, s in zip(sizes, seeds)]
+    if processes == 1 or len(jobs) == 1:
+        results = [_batch(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_batch, jobs)
+    return (np.concatenate([r[0] for r in results]),
+            np.concatenate([r[1] for r in results]))
+
+
+def play(moves, start=START):
+    """
+    Replays a scripted game through Board.
+
+    :moves: list of (unit, (col, row)) moves
+    :returns: (len(moves) + 1, n, 2) int8 board after every move, starting with the start position
+    :raises ValueError: on a move the game would not allow
+    """
+    board = Board(start)
+    history = [board.cells.copy()]
+    for i, (unit, cell) in enumerate(moves):
+        cell = tuple(cell)
+        if not board.removable()[unit]:
+            raise ValueError('move {}: block {} cannot be lifted'.format(i, unit))
+        if not board.allows(unit, cell):
+            raise ValueError('move {}: block {} cannot be dropped on {}'.format(i, unit, cell))
+        board.move(unit, cell)
+        history.append(board.cells.copy())
+    return np.array(history)
+
+
+def self_check(n_games=256, n_moves=10, seed=0):
+    """
+    Checks that the int8 cells random_games() records give the same movable()
+    and random_step() results as int64 ones, e.g. for blocks beyond column 7.
+
+    :raises ValueError: on a mismatch
+    """
+    cells = random_games(n_games, n_moves, seed=seed)[0][:, -1]
+    wide = cells.astype(np.int64)
+    if not (movable(cells) == movable(wide)).all():
+        raise ValueError('movable() differs for int8 and int64 cells')
+    narrow_step = cells.copy()
+    wide_step = wide.copy()
+    same_units = (random_step(narrow_step, np.random.default_rng(seed)) ==
+                  random_step(wide_step, np.random.default_rng(seed))).all()
+    if not same_units or not (narrow_step == wide_step).all():
+        raise ValueError('random_step() differs for int8 and int64 cells')
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulate random Creative Foraging games.")
+    ap.add_argument("--check", action="store_true", help="Only run self_check() and exit.")
+    ap.add_argument("--games", type=int, default=1000, help="Number of games.")
+    ap.add_argument("--moves", type=int, default=60, help="Moves per game.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores).")
+    ap.add_argument("--out", default="simulated_games.npz", help="Output .npz with 'cells' and 'units'.")
+    args = ap.parse_args()
+    if args.check:
+        self_check(seed=args.seed)
+        print("Self-check passed")
+        return
+
+    cells, units = simulate(args.games, args.moves, seed=args.seed, processes=args.processes)
+    np.savez_compressed(args.out, cells=cells, units=units)
+    print(f"Simulated {args.games} games of {args.moves} moves -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,18 @@
+import argparse
 import math
-import os
-import cv2
 import pandas as pd
 
+import cut_info
+from frame_cache import CACHE_DIR, FrameCache
+from frame_extraction import extract_frames
 
-def extract_frame_at_time(video_path, time_sec, output_dir):
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise ValueError(f"Error opening video file: {video_path}")
 
-    cap.set(cv2.CAP_PROP_POS_MSEC, time_sec * 1000)
-    success, frame = cap.read()
-    if not success:
-        raise ValueError(f"Could not read frame at {time_sec} seconds.")
-
-    os.makedirs(output_dir, exist_ok=True)
-    output_filename = f"frame_at_{int(time_sec)}s.jpg"
-    output_path = os.path.join(output_dir, output_filename)
-    cv2.imwrite(output_path, frame)
-    cap.release()
-    return output_path
-
-
-def extract_frames_from_csv(csv_filename, video_filename, output_dir='frames'):
+def extract_frames_from_csv(csv_filename, video_filename, output_dir='frames', offset=None, processes=1,
+                            cache=None):
+    if offset is None:
+        offset = cut_info.offset(video_filename)
     df = pd.read_csv(csv_filename, delimiter=';')
-    extracted_files = []
+    times = []
 
     for idx, row in df.iterrows():
         start, end = float(row['start_time']), float(row['end_time'])
@@ -32,19 +20,27 @@ def extract_frames_from_csv(csv_filename, video_filename, output_dir='frames'):
             continue
 
         # Divide the interval into 4 parts and pick the 3 middle points
-        times = [start + (end - start) * i / 4 for i in range(1, 4)]
-        for time in times:
-            extracted_files.append(extract_frame_at_time(video_filename, time, output_dir))
+        times.extend(start + (end - start) * i / 4 for i in range(1, 4))
 
-    return extracted_files
+    return extract_frames(video_filename, times, output_dir, offset, processes, cache)
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Extract frames of every turn in logsByGame.csv from cut_video.mp4.")
+    ap.add_argument("--processes", type=int, default=1,
+                    help="Worker processes decoding shards of the video in parallel, 0 for all cores (default: 1).")
+    ap.add_argument("--cache", default=CACHE_DIR, help=f"Frame cache shared between runs (default: {CACHE_DIR}).")
+    ap.add_argument("--cache-size", type=int, default=2048, help="Maximum size of the frame cache in MB (default: 2048).")
+    ap.add_argument("--no-cache", action="store_true", help="Decode every frame, without the frame cache.")
+    args = ap.parse_args()
+    cache = None if args.no_cache else FrameCache(args.cache, args.cache_size * 1024 ** 2)
+
     csv_filename = 'logsByGame.csv'
     video_filename = 'cut_video.mp4'
     output_dir = 'frames'
 
-    extracted_files = extract_frames_from_csv(csv_filename, video_filename, output_dir)
+    extracted_files = extract_frames_from_csv(csv_filename, video_filename, output_dir,
+                                              processes=args.processes or None, cache=cache)
     print(f"Extracted {len(extracted_files)} frames:")
     for f in extracted_files:
         print(f"  {f}")
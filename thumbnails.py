@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Gallery thumbnails for the Creative Foraging game.
+
+Figures are rasterized straight into a numpy array and written as PNG with
+zlib, so no matplotlib figure is built. GalleryRenderer does the work on a
+background thread so the game loop never waits for an image.
+"""
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from board import STEP
+
+GREEN = (0, 128, 0)  # matplotlib's 'green'
+
+
+def shape_key(coords):
+    """ the figure as sorted lattice offsets from its lower left corner; equal for translated copies """
+    xy = np.asarray(coords, dtype=float)
+    xy = np.rint((xy - xy.min(axis=0)) / STEP).astype(int)
+    return tuple(sorted(map(tuple, xy.tolist())))
+
+
+def rasterize(coords, square_size=0.07, canvas_size=10, size=500):
+    """
+    Draws green squares centered and zoomed within a fixed-size canvas, laid
+    out like the old matplotlib gallery images.
+
+    :coords: list of (x, y) block positions
+    :square_size: width/height of each square, in the units of coords
+    :canvas_size: side of the canvas in zoomed units; the figure is scaled by this
+    :size: side of the returned image in pixels
+    :returns: (size, size, 3) uint8 RGB array
+    """
+    img = np.zeros((size, size, 3), dtype=np.uint8)
+    xy = np.asarray(coords, dtype=float)
+    center = (xy.min(axis=0) + xy.max(axis=0) + square_size) / 2.
+    scale = size / float(canvas_size)
+    corners = ((xy - center) * canvas_size + canvas_size / 2.) * scale
+    side = square_size * canvas_size * scale
+    edge = max(1, int(round(size / 360.)))  # half of a 1pt outline on a 5 inch figure
+
+    for x, y in corners:
+        c0, c1 = int(round(x)), int(round(x + side))
+        r0, r1 = size - int(round(y + side)), size - int(round(y))  # rows grow downwards
+        c0, r0 = max(c0 + edge, 0), max(r0 + edge, 0)
+        c1, r1 = min(c1 - edge, size), min(r1 - edge, size)
+        if c0 < c1 and r0 < r1:
+            img[r0:r1, c0:c1] = GREEN
+    return img
+
+
+def encode_png(img):
+    """ returns the bytes of an 8 bit RGB PNG holding img """
+    h, w = img.shape[:2]
+    raw = np.concatenate([np.zeros((h, 1), dtype=np.uint8), img.reshape(h, -1)], axis=1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) +
+            chunk(b'IEND', b''))
+
+
+class GalleryRenderer(object):
+    def __init__(self, size=500, cache_size=256):
+        """
+        Renders gallery images on a background thread. Usage::
+            renderer = GalleryRenderer()
+            renderer.submit(positions, 'screenshots/gallery_1.png')
+            for image in renderer.finished():  # once per frame
+                gallery.image = image
+            renderer.reset()  # e.g. when the phase changes
+            renderer.close()
+
+        :size: side of the images in pixels
+        :cache_size: number of encoded figures kept, keyed by shape_key()
+        """
+        self.size = size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.generation = 0  # bumped by reset(); jobs and results of older generations are dropped
+        self.jobs = queue.Queue()
+        self.done = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='GalleryRenderer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, coords, output_file):
+        """ queues coords to be drawn to output_file. Returns immediately. """
+        self.jobs.put((self.generation, list(coords), output_file))
+
+    def finished(self):
+        """ paths of the images written since the last call or reset(), oldest first. Never blocks. """
+        paths = []
+        while True:
+            try:
+                generation, path = self.done.get_nowait()
+            except queue.Empty:
+                return paths
+            if generation == self.generation:
+                paths.append(path)
+
+    def reset(self):
+        """
+        forgets everything submitted so far: queued jobs are not drawn, and
+        images still being drawn or not yet collected never come out of finished()
+        """
+        self.generation += 1
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:  # keep a pending close()
+                self.jobs.put(None)
+                break
+        self.finished()
+
+    def close(self):
+        """ writes the remaining jobs and stops the thread """
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _render(self, coords):
+        key = shape_key(coords)
+        png = self.cache.pop(key, None)
+        if png is None:
+            png = encode_png(rasterize(coords, size=self.size))
+        self.cache[key] = png
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return png
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            generation, coords, output_file = job
+            if generation != self.generation:
+                continue
+            try:
+                png = self._render(coords)
+                folder = os.path.dirname(output_file)
+                if folder and not os.path.isdir(folder):
+                    os.makedirs(folder)
+                with open(output_file, 'wb') as f:
+                    f.write(png)
+            except Exception as e:  # keep the worker alive for the rest of the session
+                print('could not save gallery image', output_file, e)
+                continue
+            self.done.put((generation, output_file))